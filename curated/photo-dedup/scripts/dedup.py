@@ -7,14 +7,22 @@ Generates a JSON report and optionally an interactive HTML review page.
 
 import argparse
 import json
+import os
 import shutil
+import sqlite3
 import subprocess
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from itertools import combinations
+from math import log2
 from pathlib import Path
 
 try:
     from PIL import Image
     import imagehash
+    import numpy as np
 except ImportError:
     print("ERROR: Required packages not installed. Run:")
     print("  pip3 install Pillow imagehash pillow-heif")
@@ -26,8 +34,18 @@ try:
     register_heif_opener()
 except ImportError:
     pass  # HEIC files will be skipped
+try:
+    from pillow_heif import thumbnail as heif_thumbnail  # pillow-heif >= 0.10
+except ImportError:
+    heif_thumbnail = None
 
 SUPPORTED_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.heic', '.webp', '.tiff', '.tif', '.bmp'}
+HASH_CACHE_NAME = ".photo_dedup_cache.sqlite"
+HASH_CACHE_SCHEMA = 3  # 3: fast HEIC hashes come from embedded thumbnails
+DRAFT_SIZE = 256  # fast decode keeps at least this many pixels per side before pHash's 32x32 resize
+OUTPUT_STRATEGIES = ("copy", "hardlink", "symlink", "reflink")
+FICLONE = 0x40049409  # Linux ioctl: share extents with another file (btrfs, XFS)
+NUMPY_BLOCK_BYTES = 64 * 1024 * 1024  # peak XOR buffer per block in the numpy engine
 
 
 def get_image_files(folder: Path) -> list[Path]:
@@ -39,42 +57,395 @@ def get_image_files(folder: Path) -> list[Path]:
     return files
 
 
-def compute_hash(filepath: Path) -> "imagehash.ImageHash | None":
-    """Compute perceptual hash for an image."""
+def compute_hash(filepath: Path, fast: bool = True) -> "imagehash.ImageHash | None":
+    """Compute perceptual hash for an image.
+
+    With ``fast``, the decoder is asked for a reduced-size grayscale draft
+    (JPEG scales by 1/2..1/8 during DCT decoding) since pHash only looks at a
+    32x32 version anyway. HEIF ignores drafts, so its embedded thumbnail is
+    hashed instead when it is at least DRAFT_SIZE per side. Other formats
+    decode as before.
+    """
     try:
         with Image.open(filepath) as img:
+            if fast:
+                return imagehash.phash(_draft(img))
             return imagehash.phash(img)
     except Exception as e:
         print(f"  WARNING: Could not process {filepath.name}: {e}")
         return None
 
 
-def cluster_images(image_hashes: dict, threshold: int) -> list[list[Path]]:
-    """Group images into clusters based on hash similarity."""
+def _draft(img: "Image.Image") -> "Image.Image":
+    """A reduced-size stand-in for ``img`` for hashing, or ``img`` set to decode as a draft."""
+    if heif_thumbnail is not None and img.info.get("thumbnails"):
+        # Thumbnails are picked by their longer side; ask for one whose shorter side is enough
+        w, h = img.size
+        return heif_thumbnail(img, min_box=-(-DRAFT_SIZE * max(w, h) // max(1, min(w, h))))
+    img.draft("L", (DRAFT_SIZE, DRAFT_SIZE))
+    return img
+
+
+def hash_to_int(h: "imagehash.ImageHash") -> int:
+    """Pack an ImageHash into a plain integer (64 bits for the default pHash)."""
+    return int(str(h), 16)
+
+
+class MultiIndexHash:
+    """Multi-index hash table for exact Hamming-radius search over integer hashes.
+
+    The hash bits are split into ``m`` chunks, each with its own lookup table.
+    Two hashes within ``threshold`` bits must agree to within
+    ``threshold // m`` bits on at least one chunk (pigeonhole), so probing
+    every chunk key within that radius finds every true neighbor; candidates
+    are then verified with a full popcount. Chunk width tracks ``log2(n)`` so
+    buckets stay small as the library grows.
+    """
+
+    def __init__(self, values: list[int], threshold: int, bits: int = 64):
+        self.values = values
+        self.threshold = threshold
+        width = min(bits, max(4, round(log2(max(2, len(values))))))
+        m = max(1, min(threshold + 1, bits // width))
+        self.radius = threshold // m
+        bounds = [bits * k // m for k in range(m + 1)]
+        self.chunks = [(lo, (1 << (hi - lo)) - 1) for lo, hi in zip(bounds, bounds[1:])]
+
+        # XOR masks with at most `radius` bits set, per chunk width
+        self.flips = {}
+        for _, mask in self.chunks:
+            w = mask.bit_length()
+            if w not in self.flips:
+                self.flips[w] = [sum(1 << b for b in bits_set)
+                                 for r in range(self.radius + 1)
+                                 for bits_set in combinations(range(w), r)]
+
+        self.tables = [{} for _ in self.chunks]
+        for i, v in enumerate(values):
+            for (lo, mask), table in zip(self.chunks, self.tables):
+                table.setdefault((v >> lo) & mask, []).append(i)
+
+    def query(self, value: int) -> list[int]:
+        """Return indices of all values within ``threshold`` bits of ``value``."""
+        candidates = set()
+        for (lo, mask), table in zip(self.chunks, self.tables):
+            key = (value >> lo) & mask
+            for flip in self.flips[mask.bit_length()]:
+                bucket = table.get(key ^ flip)
+                if bucket:
+                    candidates.update(bucket)
+        return [i for i in candidates
+                if (value ^ self.values[i]).bit_count() <= self.threshold]
+
+
+def _hash_worker(filepath: Path, fast: bool = True) -> "str | None":
+    """Process-pool entry point: hash one file and return it as hex."""
+    h = compute_hash(filepath, fast)
+    return str(h) if h is not None else None
+
+
+class HashCache:
+    """SQLite cache of pHashes keyed by (path, size, mtime).
+
+    A cached hash is reused only while the file's size and mtime are unchanged,
+    so edited or replaced photos are always re-hashed. Hashes from the fast
+    and full decode paths are stored separately (``decode``) since they can
+    differ by a bit or two.
+    """
+
+    def __init__(self, db_path: Path, decode: str = "fast"):
+        self.db_path = db_path
+        self.decode = decode
+        self.conn = sqlite3.connect(db_path)
+        if self.conn.execute("PRAGMA user_version").fetchone()[0] != HASH_CACHE_SCHEMA:
+            self.conn.execute("DROP TABLE IF EXISTS hashes")
+            self.conn.execute(f"PRAGMA user_version = {HASH_CACHE_SCHEMA}")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS hashes ("
+            "path TEXT, decode TEXT, size INTEGER, mtime_ns INTEGER, phash TEXT, "
+            "PRIMARY KEY (path, decode))"
+        )
+        self.rows = {
+            path: (size, mtime_ns, phash)
+            for path, size, mtime_ns, phash in self.conn.execute(
+                "SELECT path, size, mtime_ns, phash FROM hashes WHERE decode = ?", (decode,))
+        }
+
+    def get(self, filepath: Path, st: os.stat_result) -> "imagehash.ImageHash | None":
+        row = self.rows.get(str(filepath))
+        if row and row[0] == st.st_size and row[1] == st.st_mtime_ns:
+            return imagehash.hex_to_hash(row[2])
+        return None
+
+    def put_many(self, entries: list[tuple[Path, os.stat_result, "imagehash.ImageHash"]]):
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO hashes (path, decode, size, mtime_ns, phash) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [(str(f), self.decode, st.st_size, st.st_mtime_ns, str(h)) for f, st, h in entries],
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
+def compute_hashes(images: list[Path], jobs: int = 1, cache: "HashCache | None" = None,
+                   fast: bool = True) -> tuple[dict, dict]:
+    """Hash all images, reusing cached hashes and fanning misses out to ``jobs`` processes.
+
+    Returns ``(hashes, stats)`` where ``hashes`` keeps the order of ``images``
+    and ``stats`` counts cache hits, recomputed hashes and failures.
+    """
+    found = {}
+    pending = []
+    for img in images:
+        st = img.stat()
+        h = cache.get(img, st) if cache else None
+        if h is not None:
+            found[img] = h
+        else:
+            pending.append((img, st))
+
+    stats = {"cached": len(found), "computed": 0, "failed": 0}
+    if found:
+        print(f"  {len(found)} hashes loaded from cache, {len(pending)} to compute")
+
+    fresh = []
+    if pending:
+        paths = [img for img, _ in pending]
+        worker = partial(_hash_worker, fast=fast)
+        if jobs > 1 and len(paths) > 1:
+            executor = ProcessPoolExecutor(max_workers=jobs)
+            chunksize = max(1, min(32, len(paths) // (jobs * 4)))
+            results = executor.map(worker, paths, chunksize=chunksize)
+        else:
+            executor = None
+            results = map(worker, paths)
+        try:
+            for i, ((img, st), hex_hash) in enumerate(zip(pending, results), 1):
+                if hex_hash is None:
+                    stats["failed"] += 1
+                else:
+                    h = imagehash.hex_to_hash(hex_hash)
+                    found[img] = h
+                    fresh.append((img, st, h))
+                if i % 50 == 0 or i == len(pending):
+                    print(f"  Processed {i}/{len(pending)}")
+        finally:
+            if executor:
+                executor.shutdown()
+        stats["computed"] = len(fresh)
+
+    if cache and fresh:
+        try:
+            cache.put_many(fresh)
+        except sqlite3.Error as e:  # e.g. a read-only source folder
+            print(f"  WARNING: Could not update hash cache {cache.db_path}: {e}")
+
+    hashes = {img: found[img] for img in images if img in found}
+    return hashes, stats
+
+
+def _cluster_index(image_hashes: dict, threshold: int) -> list[list[Path]]:
+    """Greedy clustering with neighbors looked up in a multi-index hash table."""
     files = list(image_hashes.keys())
-    visited = set()
+    if not files:
+        return []
+    values = [hash_to_int(image_hashes[f]) for f in files]
+    bits = max(h.hash.size for h in image_hashes.values())
+    index = MultiIndexHash(values, threshold, bits)
+
+    visited = [False] * len(files)
     clusters = []
 
     for i, file_a in enumerate(files):
-        if file_a in visited:
+        if visited[i]:
             continue
+        visited[i] = True
         cluster = [file_a]
-        visited.add(file_a)
 
-        for j in range(i + 1, len(files)):
-            file_b = files[j]
-            if file_b in visited:
-                continue
-            distance = image_hashes[file_a] - image_hashes[file_b]
-            if distance <= threshold:
-                cluster.append(file_b)
-                visited.add(file_b)
+        for j in sorted(index.query(values[i])):
+            if not visited[j]:
+                cluster.append(files[j])
+                visited[j] = True
 
         clusters.append(cluster)
 
     return clusters
 
 
+def _popcount64(x: "np.ndarray") -> "np.ndarray":
+    """Per-element popcount of a uint64 array."""
+    if hasattr(np, "bitwise_count"):  # NumPy 2.0+
+        return np.bitwise_count(x)
+    table = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+    return table[x.view(np.uint8)].reshape(*x.shape, 8).sum(axis=-1, dtype=np.uint8)
+
+
+def _cluster_numpy(image_hashes: dict, threshold: int) -> list[list[Path]]:
+    """Greedy clustering with blocked XOR + popcount distances over a uint64 array.
+
+    Seeds are taken in input order, a block at a time, against only the
+    still-unclustered images. Block height is sized so the XOR buffer stays
+    under ``NUMPY_BLOCK_BYTES`` however many images there are.
+    """
+    files = list(image_hashes.keys())
+    if any(h.hash.size > 64 for h in image_hashes.values()):
+        raise ValueError("numpy engine needs hashes of at most 64 bits")
+    values = np.array([hash_to_int(image_hashes[f]) for f in files], dtype=np.uint64)
+
+    visited = np.zeros(len(files), dtype=bool)
+    clusters = []
+
+    while not visited.all():
+        candidates = np.flatnonzero(~visited)
+        rows = max(1, NUMPY_BLOCK_BYTES // (8 * len(candidates)))
+        seeds = candidates[:rows]
+        dist = _popcount64(values[seeds, None] ^ values[None, candidates])
+
+        for seed, row in zip(seeds, dist):
+            if visited[seed]:
+                continue
+            members = candidates[row <= threshold]
+            members = members[~visited[members]]
+            visited[members] = True
+            clusters.append([files[j] for j in members])
+
+    return clusters
+
+
+CLUSTER_ENGINES = {
+    "index": _cluster_index,
+    "numpy": _cluster_numpy,
+}
+
+
+def cluster_images(image_hashes: dict, threshold: int, engine: str = "index") -> list[list[Path]]:
+    """Group images into clusters based on hash similarity.
+
+    Greedy: each not-yet-clustered image (in input order) seeds a cluster and
+    absorbs every other unclustered image within ``threshold``. All engines
+    return identical clusters; they differ only in how neighbors are found.
+    """
+    return CLUSTER_ENGINES[engine](image_hashes, threshold)
+
+
+def benchmark_decode(images: list[Path], threshold: int, sample: int = 100):
+    """Compare fast (draft/thumbnail) and full-resolution decoding on a sample of images.
+
+    Reports the speedup and how far fast-path hashes drift from full-decode
+    hashes, in bits, relative to the clustering ``threshold``, overall and
+    per file type when the sample mixes them (HEIC thumbnails drift more
+    than JPEG drafts).
+    """
+    picked = images[::max(1, len(images) // sample)][:sample]
+    print(f"\nBenchmarking fast vs full decode on {len(picked)} images...")
+    fast_time = full_time = 0.0
+    distances = []
+    by_type = {}
+    for img in picked:
+        start = time.perf_counter()
+        full = compute_hash(img, fast=False)
+        mid = time.perf_counter()
+        fast = compute_hash(img, fast=True)
+        fast_time += time.perf_counter() - mid
+        full_time += mid - start
+        if full is not None and fast is not None:
+            distances.append(full - fast)
+            by_type.setdefault(img.suffix.lower().replace(".jpeg", ".jpg"), []).append(full - fast)
+    if not distances:
+        print("  No images could be hashed.")
+        return
+
+    def drift(ds):
+        identical = sum(1 for d in ds if d == 0)
+        return (f"identical {identical}/{len(ds)}, mean {sum(ds) / len(ds):.2f} bits, "
+                f"max {max(ds)} bits")
+
+    print(f"  full decode  {full_time:8.3f}s")
+    print(f"  fast decode  {fast_time:8.3f}s  ({full_time / max(fast_time, 1e-9):.1f}x faster)")
+    print(f"  hash drift   {drift(distances)} (threshold {threshold})")
+    if len(by_type) > 1:
+        for ext, ds in sorted(by_type.items()):
+            print(f"    {ext:<9}  {drift(ds)}")
+
+
+def benchmark_clustering(image_hashes: dict, threshold: int):
+    """Time every clustering engine on the same hashes and check they agree."""
+    print(f"\nBenchmarking clustering engines on {len(image_hashes)} hashes (threshold={threshold})...")
+    reference = None
+    for name in CLUSTER_ENGINES:
+        start = time.perf_counter()
+        clusters = cluster_images(image_hashes, threshold, engine=name)
+        elapsed = time.perf_counter() - start
+        if reference is None:
+            reference = clusters
+            status = "reference"
+        else:
+            status = "identical" if clusters == reference else "MISMATCH"
+        print(f"  {name:<8} {elapsed:8.3f}s  {len(clusters)} clusters  {status}")
+
+
+class LibraryIndex:
+    """Persisted clusters of an already-deduplicated library (SQLite).
+
+    Each cluster keeps the hash of its greedy seed and the path of the photo
+    kept for it. Because greedy clustering compares everything against seeds,
+    matching new photos against stored seeds (earliest cluster first) and
+    then clustering the leftovers among themselves gives the same groups as
+    re-clustering the whole library with the new photos appended.
+    """
+
+    def __init__(self, db_path: Path, threshold: int):
+        self.db_path = db_path
+        self.threshold = threshold
+        self.conn = sqlite3.connect(db_path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS clusters ("
+            "id INTEGER PRIMARY KEY, seed_phash TEXT, path TEXT)"
+        )
+        row = self.conn.execute("SELECT value FROM meta WHERE key = 'threshold'").fetchone()
+        if row is None:
+            self.conn.execute("INSERT INTO meta VALUES ('threshold', ?)", (str(threshold),))
+            self.conn.commit()
+        elif int(row[0]) != threshold:
+            raise ValueError(f"{db_path} was built with --threshold {row[0]}, not {threshold}")
+        self.clusters = self.conn.execute(
+            "SELECT id, seed_phash, path FROM clusters ORDER BY id").fetchall()
+
+    def __len__(self):
+        return len(self.clusters)
+
+    def match(self, image_hashes: dict) -> tuple[dict, dict]:
+        """Split images into ``({path: (cluster_id, library_path)}, unmatched_hashes)``."""
+        if not self.clusters:
+            return {}, dict(image_hashes)
+        seeds = [int(seed, 16) for _, seed, _ in self.clusters]
+        bits = max(h.hash.size for h in image_hashes.values()) if image_hashes else 64
+        index = MultiIndexHash(seeds, self.threshold, bits)
+        matched, rest = {}, {}
+        for img, h in image_hashes.items():
+            hits = index.query(hash_to_int(h))
+            if hits:
+                cluster_id, _, path = self.clusters[min(hits)]
+                matched[img] = (cluster_id, path)
+            else:
+                rest[img] = h
+        return matched, rest
+
+    def add_clusters(self, entries: list[tuple["imagehash.ImageHash", Path]]):
+        """Append new clusters as ``(seed_hash, kept_path)`` pairs."""
+        self.conn.executemany(
+            "INSERT INTO clusters (seed_phash, path) VALUES (?, ?)",
+            [(str(h), str(p)) for h, p in entries],
+        )
+        self.conn.commit()
+
+    def close(self):
+        self.conn.close()
+
+
 def pick_best(cluster: list[Path]) -> Path:
     """Pick the best image from a cluster (largest file = highest quality)."""
     return max(cluster, key=lambda f: f.stat().st_size)
@@ -89,6 +460,77 @@ def format_size(size_bytes: int) -> str:
     return f"{size_bytes:.1f} TB"
 
 
+def plan_destinations(picks: list[Path], output: Path) -> dict:
+    """Assign each pick a free name in ``output`` (``name_1.jpg`` etc. on clashes)."""
+    taken = set()
+    dests = {}
+    for img in picks:
+        dest = output / img.name
+        counter = 1
+        while dest in taken or dest.exists() or dest.is_symlink():
+            dest = output / f"{img.stem}_{counter}{img.suffix}"
+            counter += 1
+        taken.add(dest)
+        dests[img] = dest
+    return dests
+
+
+def _reflink(src: Path, dest: Path):
+    """Copy-on-write clone of ``src``; raises OSError where unsupported."""
+    if sys.platform == "darwin":
+        # APFS clonefile(2) via cp -c
+        if subprocess.run(["cp", "-c", str(src), str(dest)], capture_output=True).returncode:
+            raise OSError(f"clonefile failed for {src.name}")
+    else:
+        try:
+            import fcntl
+        except ImportError:  # Windows: no FICLONE ioctl
+            raise OSError("reflinks are not supported on this platform")
+        with open(src, "rb") as fsrc, open(dest, "wb") as fdst:
+            try:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            except OSError:
+                fdst.close()
+                dest.unlink()
+                raise
+    shutil.copystat(src, dest)
+
+
+def place_file(src: Path, dest: Path, strategy: str) -> str:
+    """Put ``src`` at ``dest`` using ``strategy``; returns the strategy actually used.
+
+    Hardlinks across filesystems and reflinks on filesystems without
+    copy-on-write fall back to a regular copy.
+    """
+    try:
+        if strategy == "hardlink":
+            os.link(src, dest)
+            return strategy
+        if strategy == "symlink":
+            os.symlink(src.resolve(), dest)
+            return strategy
+        if strategy == "reflink":
+            _reflink(src, dest)
+            return strategy
+    except OSError:
+        pass
+    shutil.copy2(src, dest)
+    return "copy"
+
+
+def place_unique(picks: list[Path], output: Path, strategy: str = "copy",
+                 jobs: int = 1) -> dict:
+    """Place unique picks in ``output``; returns ``{pick: (dest, strategy_used)}``.
+
+    Destinations are assigned up front so names stay deterministic, then
+    files are placed on ``jobs`` threads (copies are I/O bound).
+    """
+    dests = plan_destinations(picks, output)
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        used = pool.map(lambda img: place_file(img, dests[img], strategy), picks)
+        return {img: (dests[img], how) for img, how in zip(picks, used)}
+
+
 def main():
     parser = argparse.ArgumentParser(description="Photo Dedup — find unique photos from duplicates")
     parser.add_argument("source", help="Source folder containing photos")
@@ -99,7 +541,33 @@ def main():
     parser.add_argument("--output", help="Custom output folder (default: source/unique/)")
     parser.add_argument("--no-html", action="store_true",
                         help="Skip HTML generation (just produce JSON report)")
+    parser.add_argument("--engine", choices=sorted(CLUSTER_ENGINES), default="index",
+                        help="Clustering engine: multi-index hash table or blocked NumPy "
+                             "popcount (default: index). Results are identical.")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Time all clustering engines and fast vs full decode "
+                             "(with hash accuracy) on this folder, then exit")
+    parser.add_argument("--against", metavar="INDEX",
+                        help="Library index (SQLite, created if missing). Match new photos against "
+                             "its clusters instead of re-clustering the library, then add the new "
+                             "unique photos to it")
+    parser.add_argument("--index-only", action="store_true",
+                        help="With --against: record this folder's unique photos in the index "
+                             "without copying (e.g. to index an existing library)")
+    parser.add_argument("--strategy", choices=OUTPUT_STRATEGIES, default="copy",
+                        help="How unique photos land in the output folder (default: copy). "
+                             "hardlink/reflink fall back to copy where unsupported.")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                        help="Parallel hashing processes and copy threads (default: all CPU cores)")
+    parser.add_argument("--full-decode", action="store_true",
+                        help="Decode images at full resolution for hashing (slower; "
+                             "default decodes JPEGs as reduced-size drafts and hashes "
+                             "HEIC embedded thumbnails)")
+    parser.add_argument("--no-cache", action="store_true",
+                        help=f"Don't read or write the hash cache ({HASH_CACHE_NAME} in source)")
     args = parser.parse_args()
+    if args.index_only and not args.against:
+        parser.error("--index-only requires --against")
 
     source = Path(args.source).resolve()
     if not source.is_dir():
@@ -117,24 +585,68 @@ def main():
 
     print(f"Found {len(images)} images. Computing hashes...")
 
-    # Compute hashes
-    hashes = {}
-    for i, img in enumerate(images, 1):
-        h = compute_hash(img)
-        if h is not None:
-            hashes[img] = h
-        if i % 50 == 0 or i == len(images):
-            print(f"  Processed {i}/{len(images)}")
+    # Compute hashes (cached by path/size/mtime, misses hashed in parallel)
+    decode = "full" if args.full_decode else "fast"
+    cache = None
+    if not args.no_cache:
+        try:
+            cache = HashCache(source / HASH_CACHE_NAME, decode)
+        except sqlite3.Error as e:
+            print(f"  WARNING: Hash cache unavailable ({source / HASH_CACHE_NAME}: {e}), "
+                  f"hashing without it")
+    try:
+        hashes, hash_stats = compute_hashes(images, max(1, args.jobs), cache,
+                                            fast=not args.full_decode)
+    finally:
+        if cache:
+            cache.close()
+
+    if args.benchmark:
+        benchmark_decode(images, args.threshold)
+        benchmark_clustering(hashes, args.threshold)
+        return
+
+    # Match against the library index, then cluster only what's left
+    library = None
+    matched = {}
+    new_hashes = hashes
+    if args.against:
+        try:
+            library = LibraryIndex(Path(args.against).expanduser().resolve(), args.threshold)
+        except ValueError as e:
+            print(f"ERROR: {e}")
+            sys.exit(1)
+        print(f"\nMatching against library index {library.db_path} ({len(library)} clusters)...")
+        matched, new_hashes = library.match(hashes)
+        print(f"  {len(matched)} already in library, {len(new_hashes)} new")
 
     # Cluster
-    print(f"\nClustering with threshold={args.threshold}...")
-    clusters = cluster_images(hashes, args.threshold)
+    print(f"\nClustering with threshold={args.threshold} (engine: {args.engine})...")
+    clusters = cluster_images(new_hashes, args.threshold, engine=args.engine)
 
     # Pick best from each cluster
     unique_picks = []
     duplicate_count = 0
     report_clusters = []
 
+    # Photos matching a library cluster are duplicates of the photo kept there
+    by_library = {}
+    for img, (cluster_id, lib_path) in matched.items():
+        by_library.setdefault((cluster_id, lib_path), []).append(img)
+    for (_, lib_path), dupes in by_library.items():
+        kept = Path(lib_path)
+        duplicate_count += len(dupes)
+        # Full paths, not names: the library copy usually shares its name with the new photo
+        report_clusters.append({
+            "selected": str(kept),
+            "selected_size": format_size(kept.stat().st_size) if kept.exists() else "?",
+            "duplicates": [str(f) for f in dupes],
+            "paths": {str(f): str(f) for f in [kept, *dupes]},
+            "count": len(dupes) + 1,
+            "library": True
+        })
+
+    pick_reports = {}
     for cluster in clusters:
         best = pick_best(cluster)
         unique_picks.append(best)
@@ -146,13 +658,14 @@ def main():
         for d in dupes:
             paths[d.name] = str(d)
 
-        report_clusters.append({
+        pick_reports[best] = {
             "selected": best.name,
             "selected_size": format_size(best.stat().st_size),
             "duplicates": [f.name for f in dupes],
             "paths": paths,
             "count": len(cluster)
-        })
+        }
+        report_clusters.append(pick_reports[best])
 
     # Sort clusters by size (most duplicates first)
     report_clusters.sort(key=lambda c: c["count"], reverse=True)
@@ -162,6 +675,9 @@ def main():
     print(f"RESULTS")
     print(f"{'='*60}")
     print(f"  Total photos scanned:  {len(hashes)}")
+    if library is not None:
+        print(f"  Already in library:    {len(matched)}")
+    print(f"  Hashes from cache:     {hash_stats['cached']} (recomputed: {hash_stats['computed']})")
     print(f"  Unique photos found:   {len(unique_picks)}")
     print(f"  Duplicates identified: {duplicate_count}")
     print(f"  Dedup ratio:           {len(hashes)}:{len(unique_picks)} ({100*len(unique_picks)/len(hashes):.0f}% unique)")
@@ -173,23 +689,32 @@ def main():
         for c in multi_clusters[:10]:
             print(f"    - {c['selected']} ({c['selected_size']}) + {len(c['duplicates'])} duplicate(s)")
 
+    kept = {}
     if args.preview:
         print(f"\n  PREVIEW MODE — no files were copied.")
+    elif args.index_only:
+        kept = {img: img for img in unique_picks}
     else:
-        # Copy unique photos
+        # Place unique photos (copy / hardlink / symlink / reflink)
         output.mkdir(parents=True, exist_ok=True)
-        print(f"\n  Copying {len(unique_picks)} unique photos to: {output}")
-        for img in unique_picks:
-            dest = output / img.name
-            if dest.exists():
-                stem = img.stem
-                suffix = img.suffix
-                counter = 1
-                while dest.exists():
-                    dest = output / f"{stem}_{counter}{suffix}"
-                    counter += 1
-            shutil.copy2(img, dest)
-        print(f"  Done! Unique photos saved to: {output}")
+        print(f"\n  Placing {len(unique_picks)} unique photos in: {output} (strategy: {args.strategy})")
+        placed = place_unique(unique_picks, output, args.strategy, args.jobs)
+        strategy_counts = {}
+        for img, (dest, used) in placed.items():
+            kept[img] = dest
+            pick_reports[img]["output_path"] = str(dest)
+            pick_reports[img]["output_strategy"] = used
+            strategy_counts[used] = strategy_counts.get(used, 0) + 1
+        print(f"  Done! Unique photos saved to: {output} "
+              f"({', '.join(f'{n} {how}' for how, n in sorted(strategy_counts.items()))})")
+
+    if library is not None:
+        if kept:
+            # Clusters and picks line up; the seed is each cluster's first member
+            library.add_clusters([(new_hashes[cluster[0]], kept[best])
+                                  for cluster, best in zip(clusters, unique_picks)])
+            print(f"  Library index updated: +{len(kept)} clusters ({len(library) + len(kept)} total)")
+        library.close()
 
     # Save report
     report = {
@@ -198,10 +723,15 @@ def main():
         "unique_count": len(unique_picks),
         "duplicate_count": duplicate_count,
         "threshold": args.threshold,
+        "hash_cache": hash_stats,
         "clusters": report_clusters
     }
+    if library is not None:
+        report["library_matches"] = len(matched)
+    if kept and not args.index_only:
+        report["output_strategy"] = args.strategy
     report_path = Path("/tmp") / f"dedup_report_{source.name}.json"
-    if not args.preview:
+    if not args.preview and not args.index_only:
         report_path = output / "dedup_report.json"
     with open(report_path, 'w') as f:
         json.dump(report, f, indent=2)
@@ -7,11 +7,15 @@ No server needed — open the HTML directly in any browser.
 
 import argparse
 import base64
+import hashlib
 import io
 import json
+import os
 import sys
 import webbrowser
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from urllib.parse import quote
 
 try:
     from PIL import Image
@@ -320,93 +324,169 @@ def make_thumb(filepath, max_size=800):
         return ""
 
 
-def find_file(source_dir, fname, cluster=None):
+def thumb_key(filepath, max_size=800):
+    """Cache key for a thumbnail: source path, size, mtime and thumbnail size."""
+    st = filepath.stat()
+    ident = f"{filepath.resolve()}\0{st.st_size}\0{st.st_mtime_ns}\0{max_size}"
+    return hashlib.sha1(ident.encode()).hexdigest()
+
+
+def _thumb_file_worker(job):
+    """Process-pool entry point: write one JPEG thumbnail to ``dest``."""
+    filepath, dest, max_size = job
+    try:
+        img = Image.open(filepath)
+        img.thumbnail((max_size, max_size), Image.LANCZOS)
+        tmp = dest.with_suffix('.tmp')
+        img.convert('RGB').save(tmp, format='JPEG', quality=82)
+        tmp.replace(dest)
+        return True
+    except Exception as e:
+        print(f"  Warning: {filepath.name}: {e}")
+        return False
+
+
+def make_thumb_files(paths, thumb_dir, jobs=1, max_size=800):
+    """Ensure a thumbnail file exists for each path; returns {path: thumbnail path}.
+
+    Thumbnails are named by ``thumb_key`` and sharded by its first two hex
+    digits, so existing ones are reused and only new or changed photos are
+    decoded. Missing thumbnails are generated on ``jobs`` processes.
+    """
+    thumbs = {}
+    todo = []
+    for fpath in paths:
+        key = thumb_key(fpath, max_size)
+        dest = thumb_dir / key[:2] / f"{key}.jpg"
+        thumbs[fpath] = dest
+        if not dest.exists():
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            todo.append((fpath, dest, max_size))
+
+    print(f"  {len(paths) - len(todo)} thumbnails reused, {len(todo)} to generate")
+    if jobs > 1 and len(todo) > 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(_thumb_file_worker, todo, chunksize=8))
+    else:
+        results = [_thumb_file_worker(job) for job in todo]
+
+    for (fpath, _, _), ok in zip(todo, results):
+        if not ok:
+            del thumbs[fpath]
+    return thumbs
+
+
+class FileIndex:
+    """Filename -> path lookup for a source tree.
+
+    The tree is walked at most once, and only if a report path turns out to
+    be stale, so even a fully moved library costs one walk instead of one
+    per photo.
+    """
+
+    def __init__(self, source_dir, report_source=None):
+        self.source_dir = Path(source_dir)
+        self.report_source = Path(report_source) if report_source else None
+        self._by_name = None
+
+    def relocate(self, path):
+        """Map a report path into ``source_dir`` when the library was moved (--source)."""
+        if self.report_source is None or self.report_source == self.source_dir:
+            return None
+        try:
+            return self.source_dir / Path(path).relative_to(self.report_source)
+        except ValueError:
+            return None
+
+    def lookup(self, fname):
+        if self._by_name is None:
+            self._by_name = {}
+            for root, dirs, files in os.walk(self.source_dir):
+                dirs.sort()
+                for name in sorted(files):
+                    self._by_name.setdefault(name, Path(root) / name)
+        return self._by_name.get(fname)
+
+
+def find_file(index, fname, cluster=None):
     """Find a file by name, using paths from cluster if available."""
     if cluster and 'paths' in cluster and fname in cluster['paths']:
         p = Path(cluster['paths'][fname])
         if p.exists():
             return p
-    matches = list(source_dir.rglob(fname))
-    return matches[0] if matches else None
+        moved = index.relocate(p)
+        if moved and moved.exists():
+            return moved
+    return index.lookup(fname)
 
 
-def build_html(data, source_dir, output_dir):
-    """Build the self-contained review HTML page."""
-    clusters = [c for c in data['clusters'] if c['count'] > 1]
-    if not clusters:
-        return None
+def resolve_groups(clusters, source_dir, report_source=None):
+    """Resolve each cluster's files on disk: [(group_index, cluster, [(fname, path)])]."""
+    index = FileIndex(source_dir, report_source)
+    resolved = []
+    for gi, c in enumerate(clusters):
+        all_names = [c['selected']] + c.get('duplicates', [])
+        entries = []
+        for fname in all_names:
+            fpath = find_file(index, fname, c)
+            if fpath and fpath.exists():
+                entries.append((fname, fpath))
+        resolved.append((gi, c, entries))
+    return resolved
 
-    total = data['total_scanned']
-    unique = data['unique_count']
-    groups = len(clusters)
-    dupes = data['duplicate_count']
 
+def render_group(gi, c, entries, thumb_src):
+    """Render one group section. ``thumb_src(path)`` returns the <img> src, or "" to skip."""
     # Checkmark SVG
     check_svg = '<svg viewBox="0 0 24 24" fill="none" stroke="currentColor" stroke-width="3"><polyline points="20 6 9 17 4 12"/></svg>'
-
-    # Build groups HTML
-    print("Generating thumbnails...")
-    groups_html = ""
+    cards_html = ""
     photo_count = 0
 
-    for gi, c in enumerate(clusters):
-        all_names = [c['selected']] + c.get('duplicates', [])
-        cards_html = ""
-
-        for fname in all_names:
-            fpath = find_file(source_dir, fname, c)
-            if not fpath or not fpath.exists():
-                continue
-
-            size_bytes = fpath.stat().st_size
-            size_str = f"{size_bytes/1024:.0f} KB" if size_bytes < 1024 * 1024 else f"{size_bytes/1024/1024:.1f} MB"
-            is_best = (fname == c['selected'])
-            thumb = make_thumb(fpath)
-            if not thumb:
-                continue
-
-            photo_count += 1
-            escaped = str(fpath).replace('"', '&quot;')
-            badge = '<span class="badge best">Best</span>' if is_best else ''
-
-            cards_html += (
-                f'<div class="card" data-path="{escaped}" data-group="{gi}" onclick="toggle(this)">'
-                f'<div class="ck">{check_svg}</div>'
-                f'<button class="zm" onclick="event.stopPropagation();openLB(this.parentElement)" title="Preview">&#x1F50D;</button>'
-                f'<img src="data:image/jpeg;base64,{thumb}" loading="lazy" alt="{fname}">'
-                f'<div class="ci"><span class="sz">{size_str}</span>{badge}</div>'
-                f'<div class="fn" title="{fname}">{fname}</div>'
-                f'</div>'
-            )
-
-        if not cards_html:
+    for fname, fpath in entries:
+        size_bytes = fpath.stat().st_size
+        size_str = f"{size_bytes/1024:.0f} KB" if size_bytes < 1024 * 1024 else f"{size_bytes/1024/1024:.1f} MB"
+        is_best = (fname == c['selected'])
+        src = thumb_src(fpath)
+        if not src:
             continue
 
-        groups_html += (
-            f'<section class="group" id="g{gi}">'
-            f'<div class="gh">'
-            f'<span class="gt">Group {gi+1}<span class="gc">{c["count"]} photos</span></span>'
-            f'<button class="btn btn-o" onclick="selGroup({gi})" style="padding:4px 10px;font-size:12px">Select all</button>'
+        photo_count += 1
+        escaped = str(fpath).replace('"', '&quot;')
+        badge = '<span class="badge best">Best</span>' if is_best else ''
+
+        cards_html += (
+            f'<div class="card" data-path="{escaped}" data-group="{gi}" onclick="toggle(this)">'
+            f'<div class="ck">{check_svg}</div>'
+            f'<button class="zm" onclick="event.stopPropagation();openLB(this.parentElement)" title="Preview">&#x1F50D;</button>'
+            f'<img src="{src}" loading="lazy" alt="{fname}">'
+            f'<div class="ci"><span class="sz">{size_str}</span>{badge}</div>'
+            f'<div class="fn" title="{fname}">{fname}</div>'
             f'</div>'
-            f'<div class="grid">{cards_html}</div>'
-            f'</section>'
         )
 
-    print(f"  Processed {photo_count} photos across {groups} groups")
+    if not cards_html:
+        return "", 0
 
-    # Config JSON for JavaScript
-    config = json.dumps({
-        "output_dir": output_dir,
-        "total": total,
-        "unique": unique,
-        "groups": groups,
-        "dupes": dupes,
-    })
+    html = (
+        f'<section class="group" id="g{gi}">'
+        f'<div class="gh">'
+        f'<span class="gt">Group {gi+1}<span class="gc">{c["count"]} photos</span></span>'
+        f'<button class="btn btn-o" onclick="selGroup({gi})" style="padding:4px 10px;font-size:12px">Select all</button>'
+        f'</div>'
+        f'<div class="grid">{cards_html}</div>'
+        f'</section>'
+    )
+    return html, photo_count
 
-    js_final = JS.replace('__CFG__', config)
 
-    # Assemble full HTML
-    html = f'''<!DOCTYPE html>
+def iter_html(data, resolved, output_dir, thumb_src):
+    """Yield the review page in chunks: header, one chunk per group, footer."""
+    total = data['total_scanned']
+    unique = data['unique_count']
+    groups = len(resolved)
+    dupes = data['duplicate_count']
+
+    yield f'''<!DOCTYPE html>
 <html lang="en">
 <head>
 <meta charset="utf-8">
@@ -440,7 +520,28 @@ def build_html(data, source_dir, output_dir):
 
 <main class="wrap">
   <p class="hint">💡 Click to select photos to keep · Click 🔍 to preview · Best quality auto-selected · Unselected duplicates will be removed</p>
-  {groups_html}
+  '''
+
+    photo_count = 0
+    for gi, c, entries in resolved:
+        html, count = render_group(gi, c, entries, thumb_src)
+        photo_count += count
+        yield html
+
+    print(f"  Processed {photo_count} photos across {groups} groups")
+
+    # Config JSON for JavaScript
+    config = json.dumps({
+        "output_dir": output_dir,
+        "total": total,
+        "unique": unique,
+        "groups": groups,
+        "dupes": dupes,
+    })
+
+    js_final = JS.replace('__CFG__', config)
+
+    yield f'''
 </main>
 
 <div class="lb" id="lb" onclick="closeLB()">
@@ -454,7 +555,49 @@ def build_html(data, source_dir, output_dir):
 </body>
 </html>'''
 
-    return html
+
+def build_html(data, source_dir, output_dir):
+    """Build the self-contained review HTML page (thumbnails embedded as base64)."""
+    clusters = [c for c in data['clusters'] if c['count'] > 1]
+    if not clusters:
+        return None
+
+    def embedded(fpath):
+        thumb = make_thumb(fpath)
+        return f"data:image/jpeg;base64,{thumb}" if thumb else ""
+
+    print("Generating thumbnails...")
+    resolved = resolve_groups(clusters, source_dir, data.get('source'))
+    return "".join(iter_html(data, resolved, output_dir, embedded))
+
+
+def write_html_streaming(data, source_dir, output_dir, out_path, thumb_dir, jobs):
+    """Write the review page straight to ``out_path`` with thumbnails as files.
+
+    Thumbnails are generated in parallel into ``thumb_dir`` (reused across
+    runs) and referenced by relative URL, so the page stays small and is
+    never held in memory as one string. Returns False if there is nothing
+    to review.
+    """
+    clusters = [c for c in data['clusters'] if c['count'] > 1]
+    if not clusters:
+        return False
+
+    resolved = resolve_groups(clusters, source_dir, data.get('source'))
+    paths = list(dict.fromkeys(fpath for _, _, entries in resolved for _, fpath in entries))
+    print(f"Generating thumbnails into {thumb_dir}...")
+    thumbs = make_thumb_files(paths, thumb_dir, jobs)
+
+    page_dir = out_path.resolve().parent
+
+    def linked(fpath):
+        thumb = thumbs.get(fpath)
+        return quote(os.path.relpath(thumb, page_dir)) if thumb else ""
+
+    with open(out_path, 'w') as f:
+        for chunk in iter_html(data, resolved, output_dir, linked):
+            f.write(chunk)
+    return True
 
 
 def main():
@@ -465,6 +608,11 @@ def main():
                         help="Default output dir for the save script")
     parser.add_argument("-o", "--out", help="Output HTML path")
     parser.add_argument("--no-open", action="store_true", help="Don't open browser")
+    parser.add_argument("--thumb-dir",
+                        help="Write thumbnails as files into this directory (reused across runs) "
+                             "and stream the page to disk instead of embedding base64 images")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 1,
+                        help="Parallel thumbnail workers with --thumb-dir (default: all CPU cores)")
     args = parser.parse_args()
 
     report_path = Path(args.report)
@@ -483,13 +631,20 @@ def main():
     print(f"Source:  {source_dir}")
     print(f"Report:  {report_path}")
 
-    html = build_html(data, source_dir, args.output_dir)
-    if not html:
+    out_path = Path(args.out) if args.out else source_dir / "photo_dedup.html"
+    if args.thumb_dir:
+        thumb_dir = Path(args.thumb_dir).expanduser().resolve()
+        written = write_html_streaming(data, source_dir, args.output_dir, out_path,
+                                       thumb_dir, max(1, args.jobs))
+    else:
+        html = build_html(data, source_dir, args.output_dir)
+        written = bool(html)
+        if html:
+            out_path.write_text(html)
+    if not written:
         print("No duplicate groups found. Nothing to review.")
         sys.exit(0)
 
-    out_path = Path(args.out) if args.out else source_dir / "photo_dedup.html"
-    out_path.write_text(html)
     size_mb = out_path.stat().st_size / 1024 / 1024
     print(f"\nReview page: {out_path} ({size_mb:.1f} MB)")
     print("Open in any browser to review and select photos.")
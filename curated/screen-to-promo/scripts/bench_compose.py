@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Compositor benchmark on synthetic media — fps per feature, no recordings needed.
+
+Builds presenter frames, alpha cutouts, a letterboxed screen recording and a
+word-timing JSON at the requested size, then times Compositor.compose on one
+config per feature (each feature isolated on an otherwise plain timeline).
+
+Usage:
+  python3 bench_compose.py                                  # 1920x1080, 4s per feature
+  python3 bench_compose.py --width 1280 --height 720 --seconds 2 --workers 4
+  python3 bench_compose.py --only zoom,caption_pop --repeat 3
+  python3 bench_compose.py --save bench.json                # record a baseline
+  python3 bench_compose.py --baseline bench.json            # exit 1 on a >10% fps drop
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from compose import Compositor  # noqa: E402
+
+WORDS = ("so here is the new dashboard you can drag any widget around and it "
+         "saves instantly then share the link with your team and you are done").split()
+
+
+# ---------------------------------------------------------------------------
+# Synthetic media
+# ---------------------------------------------------------------------------
+
+def make_presenter(out_dir, alpha_dir, n, W, H):
+    """Presenter frames on a gradient set plus matching RGBA cutouts."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    alpha_dir.mkdir(parents=True, exist_ok=True)
+    bg = Image.linear_gradient("L").resize((W, H)).convert("RGB")
+    for i in range(1, n + 1):
+        sway = int(W * 0.02 * ((i % 30) / 15 - 1))
+        body = [W // 3 + sway, H // 4, 2 * W // 3 + sway, H]
+        head = [W * 5 // 12 + sway, H // 12, W * 7 // 12 + sway, H // 3]
+        frame = bg.copy()
+        draw = ImageDraw.Draw(frame)
+        draw.rectangle(body, fill=(60, 90, 160))
+        draw.ellipse(head, fill=(230, 190, 160))
+        frame.save(out_dir / f"lob_{i:04d}.jpg", quality=90)
+
+        cut = Image.new("RGBA", (W, H), (0, 0, 0, 0))
+        draw = ImageDraw.Draw(cut)
+        draw.rectangle(body, fill=(60, 90, 160, 255))
+        draw.ellipse(head, fill=(230, 190, 160, 255))
+        cut.save(alpha_dir / f"lob_{i:04d}.png")
+
+
+def make_screenrec(out_dir, n, W, H, bounds):
+    """Letterboxed UI-like frames: sidebar, text rows, a moving cursor, and a
+    UI state change halfway through."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    top, bottom = bounds
+    for i in range(1, n + 1):
+        frame = Image.new("RGB", (W, H), (0, 0, 0))
+        draw = ImageDraw.Draw(frame)
+        page = (245, 245, 250) if i <= n // 2 else (235, 245, 235)
+        draw.rectangle([0, top, W - 1, bottom - 1], fill=page)
+        draw.rectangle([0, top, W // 6, bottom - 1], fill=(40, 44, 52))
+        row_h = max(8, (bottom - top) // 24)
+        for r, y in enumerate(range(top + row_h, bottom - row_h, row_h * 2)):
+            width = W // 3 + (r * 97 + i // 10 * 13) % (W // 3)
+            draw.rectangle([W // 5, y, W // 5 + width, y + row_h // 2], fill=(120, 130, 150))
+        x = W // 5 + (i * 7) % (W // 2)
+        y = top + (i * 5) % max(1, bottom - top - 20)
+        draw.polygon([(x, y), (x + 12, y + 18), (x + 4, y + 16)], fill=(20, 20, 20))
+        frame.save(out_dir / f"f_{i:04d}.jpg", quality=90)
+
+
+def make_words(path, seconds):
+    """About three words a second, in five-word phrases with short pauses."""
+    words, t, k = [], 0.1, 0
+    while t < seconds - 0.3:
+        words.append({"word": WORDS[k % len(WORDS)], "start": round(t, 3),
+                      "end": round(t + 0.25, 3)})
+        t += 0.6 if k % 5 == 4 else 0.3
+        k += 1
+    path.write_text(json.dumps({"words": words}))
+
+
+def media_paths(root, H):
+    """Where make_media puts each source, plus the recording's content bounds."""
+    return {
+        "presenter": root / "presenter",
+        "alpha": root / "presenter_alpha",
+        "screenrec": root / "screenrec",
+        "words": root / "words.json",
+        "bounds": [H // 8 // 2 * 2, (H - H // 8) // 2 * 2],
+    }
+
+
+def make_media(root, W, H, fps, seconds):
+    """Write all synthetic sources under ``root``; returns media_paths."""
+    n = max(2, int(seconds * fps))
+    media = media_paths(root, H)
+    make_presenter(media["presenter"], media["alpha"], n, W, H)
+    # Time-mapped segments read up to 1.5x ahead in the recording
+    make_screenrec(media["screenrec"], int(n * 1.5), W, H, media["bounds"])
+    make_words(media["words"], seconds)
+    return media
+
+
+# ---------------------------------------------------------------------------
+# Feature configs
+# ---------------------------------------------------------------------------
+
+def presenter_seg(media, duration, alpha=False):
+    seg = {"type": "presenter", "source": str(media["presenter"]),
+           "source_pattern": "lob_%04d.jpg", "duration": duration,
+           "words_json": str(media["words"])}
+    if alpha:
+        seg.update(presenter_alpha=str(media["alpha"]), alpha_pattern="lob_%04d.png")
+    return seg
+
+
+def screenrec_seg(media, duration, **extra):
+    seg = {"type": "screenrec", "source": str(media["screenrec"]),
+           "source_pattern": "f_%04d.jpg", "duration": duration,
+           "words_json": str(media["words"])}
+    seg.update(extra)
+    return seg
+
+
+def transition(mode, seconds, media, fps):
+    """A transition filling the run, between one-frame presenter and screenrec."""
+    tick = 1 / fps
+    return [presenter_seg(media, tick, alpha=True),
+            {"type": "transition", "from_segment": 0, "to_segment": 2, "duration": seconds,
+             "mode": mode, "presenter_fade_start": seconds * 0.25,
+             "presenter_fade_dur": seconds * 0.5, "bg_fade_dur": seconds * 0.75},
+            screenrec_seg(media, tick, content_bounds=media["bounds"])]
+
+
+def zoom(W, H, seconds):
+    """Zoom in, hold, and back out over the run."""
+    return {"cx": W * 0.6, "cy_start": H * 0.4, "cy_end": H * 0.55, "scale": 1.8,
+            "in_start": seconds * 0.1, "in_end": seconds * 0.3,
+            "hold_end": seconds * 0.7, "out_end": seconds * 0.9}
+
+
+FEATURES = {
+    "presenter": lambda m, W, H, fps, s: [presenter_seg(m, s)],
+    "screenrec": lambda m, W, H, fps, s: [screenrec_seg(m, s)],
+    "letterbox": lambda m, W, H, fps, s: [screenrec_seg(m, s, content_bounds=m["bounds"])],
+    "zoom": lambda m, W, H, fps, s: [screenrec_seg(m, s, content_bounds=m["bounds"],
+                                                   zoom=zoom(W, H, s))],
+    "time_map": lambda m, W, H, fps, s: [screenrec_seg(
+        m, s, time_map={"vo_times": [0, s / 2, s], "src_times": [0, s * 0.3, s * 1.5]})],
+    "smooth_jumps": lambda m, W, H, fps, s: [screenrec_seg(
+        m, s, content_bounds=m["bounds"],
+        smooth_jumps=[round(0.5 + k, 2) for k in range(int(s))])],
+    "caption_pop": lambda m, W, H, fps, s: [screenrec_seg(m, s)],
+    "caption_karaoke": lambda m, W, H, fps, s: [screenrec_seg(m, s)],
+    "crossfade": lambda m, W, H, fps, s: transition("crossfade", s, m, fps),
+    "wipe": lambda m, W, H, fps, s: transition("wipe", s, m, fps),
+    "overlay_dissolve": lambda m, W, H, fps, s: transition("overlay_dissolve", s, m, fps),
+    "card": lambda m, W, H, fps, s: [{"type": "card", "background": "#1E1E3C",
+                                      "text": "Download Now", "duration": s}],
+}
+
+
+def feature_config(name, media, W, H, fps, seconds):
+    style = name.split("_", 1)[1] if name.startswith("caption_") else None
+    return {
+        "fps": fps, "width": W, "height": H,
+        "segments": FEATURES[name](media, W, H, fps, seconds),
+        "captions": {"enabled": style is not None, "style": style or "pop",
+                     "font_size": max(12, H * 52 // 1080),
+                     "position_y": -max(30, H * 130 // 1080)},
+    }
+
+
+# ---------------------------------------------------------------------------
+# Runner
+# ---------------------------------------------------------------------------
+
+def run_feature(config, out_dir, workers, repeat):
+    """Best-of-``repeat`` fps of a cold-cache compose; returns (frames, seconds)."""
+    best = None
+    for _ in range(repeat):
+        comp = Compositor(json.loads(json.dumps(config)))
+        with contextlib.redirect_stdout(io.StringIO()):
+            t0 = time.perf_counter()
+            n_frames, _ = comp.compose(out_dir, workers=workers, incremental=False)
+            elapsed = time.perf_counter() - t0
+        comp.close()
+        best = elapsed if best is None else min(best, elapsed)
+    return n_frames, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compositor benchmark on synthetic media")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("--seconds", type=float, default=4.0,
+                        help="Timeline length per feature (default: 4)")
+    parser.add_argument("--workers", type=int, default=1, help="Passed to compose")
+    parser.add_argument("--repeat", type=int, default=1, help="Report the best of N runs")
+    parser.add_argument("--only", help="Comma-separated features (default: all): "
+                                       + ", ".join(FEATURES))
+    parser.add_argument("--media", metavar="DIR",
+                        help="Keep synthetic media in DIR and reuse it on later runs")
+    parser.add_argument("--save", metavar="FILE", help="Write results as JSON")
+    parser.add_argument("--baseline", metavar="FILE",
+                        help="Compare with a --save'd run; exit 1 on a regression")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="Allowed fractional fps drop vs --baseline (default: 0.10)")
+    args = parser.parse_args()
+
+    names = args.only.split(",") if args.only else list(FEATURES)
+    unknown = [n for n in names if n not in FEATURES]
+    if unknown:
+        parser.error(f"unknown feature(s): {', '.join(unknown)}")
+    W, H, fps = args.width // 2 * 2, args.height // 2 * 2, args.fps
+
+    with tempfile.TemporaryDirectory(prefix="bench_compose_") as tmp:
+        root = Path(args.media or tmp) / f"{W}x{H}_{fps}fps_{args.seconds:g}s"
+        media = media_paths(root, H)
+        if not media["words"].exists():  # written last, so its presence means complete
+            print(f"Generating synthetic media in {root}...")
+            t0 = time.perf_counter()
+            make_media(root, W, H, fps, args.seconds)
+            print(f"  done in {time.perf_counter() - t0:.1f}s")
+
+        baseline = {}
+        if args.baseline:
+            with open(args.baseline) as f:
+                baseline = json.load(f)["features"]
+
+        print(f"\n{W}x{H} @ {fps}fps, {args.seconds:g}s per feature, "
+              f"{args.workers} worker(s), best of {args.repeat}")
+        print(f"{'feature':<18} {'frames':>6} {'time':>8} {'fps':>8}"
+              + (f" {'baseline':>9} {'change':>8}" if baseline else ""))
+        results, regressions = {}, []
+        for name in names:
+            config = feature_config(name, media, W, H, fps, args.seconds)
+            n_frames, elapsed = run_feature(config, Path(tmp) / "out" / name,
+                                            args.workers, args.repeat)
+            rate = n_frames / max(elapsed, 1e-9)
+            results[name] = {"frames": n_frames, "seconds": round(elapsed, 4),
+                             "fps": round(rate, 2)}
+            line = f"{name:<18} {n_frames:>6} {elapsed:>7.2f}s {rate:>8.1f}"
+            ref = baseline.get(name, {}).get("fps")
+            if ref:
+                change = rate / ref - 1
+                line += f" {ref:>9.1f} {change:>+7.0%}"
+                if change < -args.tolerance:
+                    regressions.append(name)
+                    line += "  REGRESSION"
+            print(line)
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"width": W, "height": H, "fps": fps, "seconds": args.seconds,
+                       "workers": args.workers, "features": results}, f, indent=1)
+        print(f"\nResults: {args.save}")
+    if regressions:
+        print(f"\nfps dropped more than {args.tolerance:.0%} for: {', '.join(regressions)}",
+              file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,16 +5,21 @@ Screen-to-Promo Compositor — Frame-by-frame video compositing engine.
 Usage:
   python3 compose.py --config config.json --output-frames ./frames/out/
   python3 compose.py --config config.json --output final.mp4   # encode directly
+  python3 compose.py --config config.json --output final.mp4 --workers 8   # parallel render
+  python3 compose.py --config config.json --output final.mp4 --dump-plan plan.json   # inspect per-frame plan
+  python3 compose.py --config config.json --output draft.mp4 --preview 0.25:10   # quick pacing check
+  python3 compose.py --config config.json --output-frames ./out/ --profile trace.json   # where time goes
 
 Config JSON structure:
 {
   "fps": 30,
+  "source_fps": 30,                  # optional: rate source frames were extracted at (default: fps)
   "width": 1920,
   "height": 1080,
   "segments": [
     {
       "type": "presenter",           # presenter | screenrec | transition | card
-      "source": "path/to/frames/",   # frame dir
+      "source": "path/to/frames/",   # frame dir, or a video file decoded directly
       "source_pattern": "lob_%04d.jpg",
       "duration": 8.0,
       "audio": "path/to/audio.wav",
@@ -78,6 +83,8 @@ Config JSON structure:
 """
 
 import argparse
+import copy
+import hashlib
 import json
 import math
 import os
@@ -85,8 +92,13 @@ import shutil
 import subprocess
 import sys
 import platform
+import threading
 import time
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from functools import lru_cache
+from itertools import islice
 from pathlib import Path
 
 import numpy as np
@@ -205,6 +217,76 @@ def active_word_group(words, t, window=6):
     return group, active_in_group
 
 
+class WordTimeline:
+    """Indexed view of a word list for O(log n) caption lookups.
+
+    Answers exactly what ``active_word`` / ``active_word_group`` would for the
+    same list: the first word (in list order) with start <= t <= end + 0.15.
+    With starts sorted, words that have started are a prefix found by bisect,
+    and the first word still active is found by bisecting a running max of
+    ``end + 0.15``. Karaoke line bounds depend only on the active index, so
+    they are computed once per word up front. Unsorted lists fall back to
+    the linear scans.
+    """
+
+    def __init__(self, words, window=6):
+        self.words = words
+        self.window = window
+        self.starts = [w["start"] for w in words]
+        self.indexed = all(a <= b for a, b in zip(self.starts, self.starts[1:]))
+        self.reach = []  # running max of end + 0.15
+        hi = -math.inf
+        for w in words:
+            hi = max(hi, w["end"] + 0.15)
+            self.reach.append(hi)
+        self.lines = [self._line_bounds(i) for i in range(len(words))] if self.indexed else []
+
+    def __len__(self):
+        return len(self.words)
+
+    def _line_bounds(self, idx):
+        """Same line walk as active_word_group, for active word idx."""
+        words, window = self.words, self.window
+        line_start = idx
+        while line_start > 0 and (words[line_start]["start"] - words[line_start - 1]["end"]) < 0.5:
+            if idx - line_start >= window - 1:
+                break
+            line_start -= 1
+        line_end = idx
+        while line_end < len(words) - 1 and (words[line_end + 1]["start"] - words[line_end]["end"]) < 0.5:
+            if line_end - line_start >= window - 1:
+                break
+            line_end += 1
+        return line_start, line_end
+
+    def index_at(self, t):
+        """Index of the active word at t, or None."""
+        if not self.indexed:
+            for i, w in enumerate(self.words):
+                if w["start"] <= t <= w["end"] + 0.15:
+                    return i
+            return None
+        i = bisect_left(self.reach, t)
+        if i < bisect_right(self.starts, t):
+            return i
+        return None
+
+    def word_at(self, t):
+        """Equivalent to ``active_word(words, t)``."""
+        i = self.index_at(t)
+        return self.words[i] if i is not None else None
+
+    def group_at(self, t):
+        """Equivalent to ``active_word_group(words, t, window)``."""
+        if not self.indexed:
+            return active_word_group(self.words, t, self.window)
+        idx = self.index_at(t)
+        if idx is None:
+            return None, -1
+        line_start, line_end = self.lines[idx]
+        return self.words[line_start:line_end + 1], idx - line_start
+
+
 # ---------------------------------------------------------------------------
 # Config validation
 # ---------------------------------------------------------------------------
@@ -244,8 +326,8 @@ def validate_config(config):
 
         if stype in ("presenter", "screenrec"):
             src = Path(seg.get("source", ""))
-            if not src.is_dir():
-                errors.append(f"Segment {i}: source dir not found: {src}")
+            if not (src.is_dir() or src.is_file()):
+                errors.append(f"Segment {i}: source frame dir or video not found: {src}")
 
         if stype == "transition":
             n = len(config["segments"])
@@ -263,22 +345,646 @@ def validate_config(config):
     return errors
 
 
+def fatal_config_errors(errors):
+    """The validate_config messages that rule out composing (missing inputs)."""
+    return [e for e in errors if "missing" in e.lower() and "defaulting" not in e.lower()]
+
+
+def parse_preview(spec):
+    """Parse a --preview ``SCALE[:FPS]`` spec into (scale, fps or None)."""
+    scale, _, fps = spec.partition(":")
+    try:
+        scale = float(scale)
+        fps = float(fps) if fps else None
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected SCALE[:FPS], got {spec!r}")
+    if not 0 < scale <= 1 or (fps is not None and fps <= 0):
+        raise argparse.ArgumentTypeError(f"need 0 < SCALE <= 1 and FPS > 0, got {spec!r}")
+    if fps is not None and fps.is_integer():
+        fps = int(fps)
+    return scale, fps
+
+
+def preview_config(config, scale, fps=None):
+    """Copy of config for a draft render at ``scale`` times the size and at ``fps``.
+
+    Pixel-space settings (content bounds, zoom centres, caption size and
+    position) shrink with the frame; segment timings are untouched and
+    sources stay indexed at their original frame rate, so the timeline is
+    the same as the full render.
+    """
+    cfg = copy.deepcopy(config)
+
+    def px(v):
+        return int(round(v * scale))
+
+    # Even dimensions for yuv420p
+    cfg["width"] = max(2, px(config.get("width", 1920)) // 2 * 2)
+    cfg["height"] = max(2, px(config.get("height", 1080)) // 2 * 2)
+    cfg["source_fps"] = config.get("source_fps", config.get("fps", 30))
+    if fps:
+        cfg["fps"] = fps
+    cfg["preview_scale"] = scale
+
+    for seg in cfg.get("segments", []):
+        if seg.get("content_bounds"):
+            seg["content_bounds"] = [px(v) for v in seg["content_bounds"]]
+        zooms = seg.get("zoom") or seg.get("zooms") or []
+        for z in zooms if isinstance(zooms, list) else [zooms]:
+            for key in ("cx", "cy_start", "cy_end"):
+                if key in z:
+                    z[key] = px(z[key])
+
+    cc = cfg.get("captions")
+    if cc:
+        cc["font_size"] = max(1, px(cc.get("font_size", 52)))
+        cc["position_y"] = px(cc.get("position_y", -130))
+    return cfg
+
+
+# ---------------------------------------------------------------------------
+# Profiling
+# ---------------------------------------------------------------------------
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+class NullProfiler:
+    """Profiler stand-in used when --profile is off: every call is a no-op."""
+
+    enabled = False
+
+    def span(self, name):
+        return _NO_SPAN
+
+    def frame(self, fi):
+        pass
+
+    def drain(self):
+        return []
+
+    def merge(self, events):
+        pass
+
+
+class _Span:
+    __slots__ = ("prof", "name", "start")
+
+    def __init__(self, prof, name):
+        self.prof = prof
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.prof._record(self.name, self.start, time.perf_counter_ns())
+        return False
+
+
+class Profiler:
+    """Timed spans of the per-frame pipeline, for --profile.
+
+    ``frame(fi)`` tags the calling thread's subsequent spans with an output
+    frame, so stages can be attributed to segments. perf_counter is a
+    system-wide monotonic clock, so spans from worker processes line up
+    with the parent's on one timeline.
+    """
+
+    enabled = True
+
+    def __init__(self):
+        self.events = []  # (name, frame, start_ns, end_ns, pid, tid)
+        self._local = threading.local()
+
+    def span(self, name):
+        return _Span(self, name)
+
+    def frame(self, fi):
+        self._local.fi = fi
+
+    def _record(self, name, start, end):
+        self.events.append((name, getattr(self._local, "fi", None), start, end,
+                            os.getpid(), threading.get_native_id()))
+
+    def drain(self):
+        """Return and forget the spans recorded so far (shipped back by workers)."""
+        events, self.events = self.events, []
+        return events
+
+    def merge(self, events):
+        """Add spans drained from a worker process."""
+        self.events.extend(events)
+
+    def write_trace(self, path):
+        """Write the spans as a Chrome / Perfetto trace (open in ui.perfetto.dev)."""
+        t0 = min((ev[2] for ev in self.events), default=0)
+        trace = [{"name": "process_name", "ph": "M", "pid": pid,
+                  "args": {"name": "compose" if pid == os.getpid() else f"worker {pid}"}}
+                 for pid in sorted({ev[4] for ev in self.events})]
+        for name, fi, start, end, pid, tid in self.events:
+            trace.append({"name": name, "cat": "compose", "ph": "X", "pid": pid, "tid": tid,
+                          "ts": (start - t0) / 1000, "dur": (end - start) / 1000,
+                          "args": {} if fi is None else {"frame": fi}})
+        with open(path, "w") as f:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, f)
+
+    def summary(self, plan, segments):
+        """Per-segment table of ms per rendered frame spent in each stage."""
+        stages = []
+        totals = {}  # seg index -> {stage: ns}
+        frames = {}  # seg index -> set of rendered frames
+        for name, fi, start, end, _, _ in self.events:
+            if fi is None:
+                continue
+            seg = plan[fi]["seg"]
+            if name not in stages:
+                stages.append(name)
+            row = totals.setdefault(seg, {})
+            row[name] = row.get(name, 0) + end - start
+            if name == "render":
+                frames.setdefault(seg, set()).add(fi)
+        if not totals:
+            return "No frames rendered."
+
+        order = ["render"] + [st for st in stages if st != "render"]
+        head = f"{'seg':>4} {'type':<10} {'frames':>6} " + " ".join(f"{st:>11}" for st in order)
+        lines = ["ms per rendered frame (stages nest inside render; decode may run on the "
+                 "prefetch thread)", head, "-" * len(head)]
+        for seg in sorted(totals, key=lambda k: -1 if k is None else k):
+            n = len(frames.get(seg, ())) or 1
+            stype = "(blank)" if seg is None else segments[seg]["type"]
+            cells = " ".join(f"{totals[seg].get(st, 0) / n / 1e6:>11.2f}" for st in order)
+            lines.append(f"{'-' if seg is None else seg:>4} {stype:<10} "
+                         f"{len(frames.get(seg, ())):>6} {cells}")
+        return "\n".join(lines)
+
+
+# ---------------------------------------------------------------------------
+# Source frames: cache, prefetch, video decoding
+# ---------------------------------------------------------------------------
+
+DEFAULT_FRAME_CACHE_MB = 512
+DEFAULT_PREFETCH = 8
+
+
+class FrameCache:
+    """Thread-safe LRU of decoded source frames and alpha layers, bounded by decoded bytes.
+
+    Cached images are shared, not copied: callers must treat them as
+    read-only. A key being decoded by one thread is waited on by the others
+    instead of being decoded twice.
+    """
+
+    def __init__(self, budget_mb=DEFAULT_FRAME_CACHE_MB):
+        self.budget = int(budget_mb * 1024 * 1024)
+        self.nbytes = 0
+        self._items = OrderedDict()
+        self._ids = set()
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def holds(self, img):
+        """True if ``img`` is a cached (shared) image."""
+        return id(img) in self._ids
+
+    def get(self, key, load):
+        """Return the image for ``key``, calling ``load()`` on a miss."""
+        with self._lock:
+            img = self._items.get(key)
+            if img is not None:
+                self._items.move_to_end(key)
+                return img
+            event = self._pending.get(key)
+            owner = event is None
+            if owner:
+                event = self._pending[key] = threading.Event()
+
+        if not owner:
+            event.wait()
+            with self._lock:
+                img = self._items.get(key)
+            if img is not None:
+                return img
+            return load()  # loader failed or entry already evicted
+
+        img = None
+        try:
+            img = load()
+        finally:
+            with self._lock:
+                if img is not None:
+                    self._store(key, img)
+                del self._pending[key]
+            event.set()
+        return img
+
+    def clear(self):
+        """Drop every entry (e.g. after source frames changed on disk)."""
+        with self._lock:
+            self._items.clear()
+            self._ids.clear()
+            self.nbytes = 0
+
+    def _store(self, key, img):
+        self._items[key] = img
+        self._ids.add(id(img))
+        self.nbytes += _entry_bytes(img)
+        # Always keep the newest entry, even if it alone exceeds the budget
+        while self.nbytes > self.budget and len(self._items) > 1:
+            _, old = self._items.popitem(last=False)
+            self._ids.discard(id(old))
+            self.nbytes -= _entry_bytes(old)
+
+
+def _entry_bytes(entry):
+    """Decoded size of a cached PIL image or PremultipliedLayer."""
+    if isinstance(entry, Image.Image):
+        return entry.width * entry.height * len(entry.getbands())
+    return entry.nbytes
+
+
+class FramePrefetcher:
+    """Decode the source frames of upcoming plan entries on a background thread.
+
+    The render loop reports the frame it is on via ``advance``; the thread
+    keeps up to ``depth`` frames ahead of it, loading through the
+    Compositor's FrameCache so the render thread finds them already decoded.
+    "Ahead" follows the frames passed to ``schedule`` (a worker's chunk, the
+    frames an incremental run re-renders), or the whole plan if none were.
+    PIL releases the GIL while decoding and resampling, so this overlaps
+    with compositing.
+    """
+
+    def __init__(self, comp, depth):
+        self.comp = comp
+        self.depth = depth
+        self._order = None  # frames to render, in order; None = the whole plan
+        self._pos = {}      # frame -> position in _order
+        self._cursor = None  # position rendered last (in _order or the plan), None = idle
+        self._next = 0
+        self._stop = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="frame-prefetch", daemon=True)
+        self._thread.start()
+
+    def schedule(self, frames):
+        """Prefetch only ``frames``, in this order, until a frame outside them is rendered."""
+        with self._cond:
+            self._order = list(frames)
+            self._pos = {fi: k for k, fi in enumerate(self._order)}
+            self._cursor, self._next = None, 0  # idle until the first of them renders
+
+    def advance(self, fi):
+        with self._cond:
+            k = fi
+            if self._order is not None:
+                k = self._pos.get(fi)
+                if k is None:  # rendering outside the schedule: follow the plan again
+                    self._order, self._pos, k = None, {}, fi
+            # Restart just ahead of the cursor after a seek in either direction
+            if self._cursor is None or k < self._cursor or k >= self._next:
+                self._next = k + 1
+            self._cursor = k
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            self._stop = True
+            self._cond.notify()
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stop and (self._cursor is None
+                                          or self._next > self._cursor + self.depth
+                                          or self._next >= self._end()):
+                    self._cond.wait()
+                if self._stop:
+                    return
+                k = self._next
+                fi = k if self._order is None else self._order[k]
+                self._next += 1
+            try:
+                self.comp.prof.frame(fi)
+                for load, seg, fidx in self.comp._frame_sources(fi):
+                    load(seg, fidx)
+            except Exception:
+                pass  # the render thread will hit (and report) the same error
+
+    def _end(self):
+        return len(self.comp.plan) if self._order is None else len(self._order)
+
+
+def _probe_frame_count(path, fps):
+    """Number of frames ``path`` yields when resampled to ``fps`` (0 if unknown)."""
+    try:
+        out = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration",
+             "-of", "default=noprint_wrappers=1:nokey=1", str(path)],
+            capture_output=True, text=True, check=True).stdout
+        return max(0, int(round(float(out.strip()) * fps)))
+    except (OSError, ValueError, subprocess.CalledProcessError):
+        return 0
+
+
+class VideoFrameSource:
+    """Decode a segment's frames straight from its video file.
+
+    One persistent ffmpeg process streams rawvideo RGB, already scaled and
+    white-padded to the output size at the output fps (the same transform
+    prep_source.sh applies). Forward reads consume the pipe sequentially;
+    the process is restarted with an input seek only when a read goes
+    backward or further ahead than SEEK_AHEAD frames.
+    """
+
+    SEEK_AHEAD = 90  # frames; longer forward gaps are cheaper to seek than to decode
+
+    def __init__(self, path, width, height, fps):
+        self.path = str(path)
+        st = os.stat(path)
+        self.stamp = f"{self.path}:{st.st_size}:{st.st_mtime_ns}"  # identity for frame keys
+        self.W, self.H, self.fps = width, height, fps
+        self.frame_bytes = width * height * 3
+        self.n_frames = _probe_frame_count(path, fps)
+        self._proc = None
+        self._next = 1      # 1-based index of the next frame the pipe yields
+        self._last = None   # (index, raw bytes) of the latest decoded frame
+        self._warned = False
+        self._lock = threading.Lock()
+
+    def read(self, fidx):
+        """Return frame ``fidx`` (1-based) as an RGB image."""
+        with self._lock:
+            if self._last and self._last[0] == fidx:
+                return self._to_image(self._last[1])
+            if self._proc is None or fidx < self._next or fidx - self._next > self.SEEK_AHEAD:
+                self._open(fidx)
+            while self._next <= fidx:
+                raw = self._proc.stdout.read(self.frame_bytes)
+                if len(raw) < self.frame_bytes:
+                    break  # past the end: hold the last frame
+                self._last = (self._next, raw)
+                self._next += 1
+            if self._last is None:
+                if not self._warned:
+                    print(f"  Warning: could not decode frames from {self.path}", file=sys.stderr)
+                    self._warned = True
+                return Image.new("RGB", (self.W, self.H), (255, 255, 255))
+            return self._to_image(self._last[1])
+
+    def close(self):
+        with self._lock:
+            self._stop_proc()
+
+    def _to_image(self, raw):
+        return Image.frombytes("RGB", (self.W, self.H), raw)
+
+    def _open(self, fidx):
+        self._stop_proc()
+        vf = (f"fps={self.fps},"
+              f"scale={self.W}:-2:force_original_aspect_ratio=decrease,"
+              f"pad={self.W}:{self.H}:(ow-iw)/2:(oh-ih)/2:white")
+        # Quiet: decoders are cut off mid-stream on every seek and at exit;
+        # a source that yields no frames at all is reported by read()
+        cmd = ["ffmpeg", "-v", "quiet", "-nostdin"]
+        if fidx > 1:
+            cmd += ["-ss", f"{(fidx - 1) / self.fps:.6f}"]
+        cmd += ["-i", self.path, "-an", "-vf", vf,
+                "-f", "rawvideo", "-pix_fmt", "rgb24", "-"]
+        self._proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stdin=subprocess.DEVNULL)
+        self._next = fidx
+
+    def _stop_proc(self):
+        if self._proc is not None:
+            self._proc.kill()
+            self._proc.stdout.close()
+            self._proc.wait()
+            self._proc = None
+
+
+# ---------------------------------------------------------------------------
+# Compositing kernels
+# ---------------------------------------------------------------------------
+
+
+class PremultipliedLayer:
+    """An RGBA frame cropped to its non-transparent box, ready for overlay_into.
+
+    ``rgb`` is colour premultiplied by alpha and ``alpha`` is coverage in
+    0..256 fixed point repeated per channel, both uint16 and contiguous so
+    the per-frame kernel is same-dtype multiply/add/shift only.
+    """
+
+    def __init__(self, rgba):
+        self.box = rgba.getchannel("A").getbbox()  # None if fully transparent
+        if self.box is None:
+            self.rgb = self.alpha = None
+            self.nbytes = 0
+            return
+        crop = rgba.crop(self.box)
+        # PIL's "RGBa" mode is premultiplied; split/merge keep it that way
+        r, g, b, a = crop.convert("RGBa").split()
+        self.rgb = np.asarray(Image.merge("RGB", (r, g, b))).astype(np.uint16)
+        self.alpha = np.asarray(Image.merge("RGB", (a, a, a))).astype(np.uint16)
+        self.alpha += self.alpha >> 7  # 0..255 -> 0..256
+        self.nbytes = self.rgb.nbytes + self.alpha.nbytes
+
+
+def fade_into(out, src, alpha, color, tmp):
+    """out = color + (src - color) * alpha for a solid grey level ``color``.
+
+    ``out`` is uint8 and ``tmp`` a uint16 scratch buffer of the same shape.
+    """
+    w = int(alpha * 256 + 0.5)
+    np.multiply(src, w, out=tmp, dtype=np.uint16)
+    np.add(tmp, color * (256 - w) + 128, out=tmp)
+    np.right_shift(tmp, 8, out=tmp)
+    np.copyto(out, tmp, casting="unsafe")
+    return out
+
+
+def overlay_into(out, layer, opacity, tmp, tmp2):
+    """Composite a PremultipliedLayer over ``out`` in place, scaled by ``opacity``.
+
+    Only the layer's box is touched. ``tmp``/``tmp2`` are uint16 scratch
+    buffers at least as large as ``out``.
+    """
+    w = int(opacity * 256 + 0.5)
+    if layer.box is None or w <= 0:
+        return out
+    x0, y0, x1, y1 = layer.box
+    region = out[y0:y1, x0:x1]
+    n = region.size
+    t = tmp.reshape(-1)[:n].reshape(region.shape)
+    k = tmp2.reshape(-1)[:n].reshape(region.shape)
+
+    # bg * (1 - coverage * opacity) + premultiplied fg * opacity
+    if w >= 256:
+        np.copyto(k, layer.alpha)  # 256 * 256 would overflow uint16
+    else:
+        np.multiply(layer.alpha, w, out=k)
+        np.right_shift(k, 8, out=k)
+    np.subtract(256, k, out=k)
+    np.copyto(t, region)
+    np.multiply(t, k, out=t)
+    np.add(t, 128, out=t)
+    np.right_shift(t, 8, out=t)
+    np.multiply(layer.rgb, w, out=k)
+    np.right_shift(k, 8, out=k)
+    np.add(t, k, out=t)
+    np.minimum(t, 255, out=t)
+    np.copyto(region, t, casting="unsafe")
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Incremental output
+# ---------------------------------------------------------------------------
+
+MANIFEST_NAME = ".compose_manifest.json"
+MANIFEST_VERSION = 3  # bump whenever a code change alters rendered pixels
+
+# Segment fields that change pixels without showing up in the render plan;
+# the effect of everything else (timing, zooms, time maps, words, sources)
+# is already captured by plan entries and source digests.
+SEGMENT_LOOK_KEYS = ("type", "content_bounds", "background", "text")
+
+
+def load_manifest(out_dir):
+    """Frame keys recorded by the previous --output-frames run into out_dir, or []."""
+    try:
+        with open(Path(out_dir) / MANIFEST_NAME) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return []
+    if data.get("version") != MANIFEST_VERSION:
+        return []
+    return data.get("frames", [])
+
+
+def save_manifest(out_dir, keys):
+    path = Path(out_dir) / MANIFEST_NAME
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w") as f:
+        json.dump({"version": MANIFEST_VERSION, "frames": keys}, f)
+    os.replace(tmp, path)
+
+
+def discard_manifest(out_dir):
+    """Remove out_dir's manifest before its frames are relinked or overwritten,
+    so a run that stops partway leaves no keys vouching for changed frames."""
+    try:
+        (Path(out_dir) / MANIFEST_NAME).unlink()
+    except FileNotFoundError:
+        pass
+
+
+def reuse_previous_output(out_dir, keys, old_keys):
+    """Keep or relocate frames of a previous run whose frame key is unchanged.
+
+    Frames with the same key at the same index are left alone; frames whose
+    key moved (e.g. a retimed segment shifted them) are hardlinked into
+    their new position. Frames past the new end are removed. Returns the
+    indices that still have to be rendered.
+    """
+    out_dir = Path(out_dir)
+
+    def frame(fi):
+        return out_dir / f"f_{fi + 1:04d}.jpg"
+
+    old_at = {}
+    for j, key in enumerate(old_keys):
+        old_at.setdefault(key, j)
+
+    todo, moves = [], {}
+    for fi, key in enumerate(keys):
+        if fi < len(old_keys) and old_keys[fi] == key and frame(fi).exists():
+            continue
+        j = old_at.get(key)
+        if j is not None and frame(j).exists():
+            moves[fi] = j
+        else:
+            todo.append(fi)
+
+    if moves:
+        # Stage sources first: a move target may be another move's source
+        stage = out_dir / ".reuse"
+        stage.mkdir(exist_ok=True)
+        for j in set(moves.values()):
+            _link_or_copy(frame(j), stage / frame(j).name)
+        for fi, j in moves.items():
+            _link_or_copy(stage / frame(j).name, frame(fi))
+        shutil.rmtree(stage)
+
+    for j in range(len(keys), len(old_keys)):
+        if frame(j).exists():
+            frame(j).unlink()
+    return todo
+
+
+def _link_or_copy(src, dest):
+    """Hardlink src to dest, replacing dest; copy if the filesystem refuses links."""
+    if dest.exists() or dest.is_symlink():
+        dest.unlink()
+    try:
+        os.link(src, dest)
+    except OSError:
+        shutil.copyfile(src, dest)
+
+
 # ---------------------------------------------------------------------------
 # Compositor
 # ---------------------------------------------------------------------------
 
 
 class Compositor:
-    def __init__(self, config):
+    def __init__(self, config, plan=None, cache_mb=DEFAULT_FRAME_CACHE_MB,
+                 prefetch=DEFAULT_PREFETCH, profile=False, frames=None):
         self.cfg = config
+        self.prof = Profiler() if profile else NullProfiler()
         self.W = config.get("width", 1920)
         self.H = config.get("height", 1080)
         self.FPS = config.get("fps", 30)
+        self.SRC_FPS = config.get("source_fps", self.FPS)
+        # Set by preview_config: pixel constants shrink with the frame and
+        # resampling trades quality for speed
+        self.scale = config.get("preview_scale", 1.0)
+        self.resample = Image.BILINEAR if "preview_scale" in config else Image.LANCZOS
         self.cap_cfg = config.get("captions", {})
         self._init_fonts()
+        self._videos = {}  # source path -> VideoFrameSource
         self._preload_segments()
-        self._frame_cache = {}
-        self._cache_max = 120  # keep last N frames in memory
+        self._frames = frames if frames is not None else FrameCache(cache_mb)
+        self._prefetch_depth = prefetch
+        self._prefetcher = None  # started by the first render_frame
+        self._buffers = None  # compositing buffers, allocated on first use
+        self._held_for = None  # transition or jump whose still frames are held
+        self._held = {}
+        self._digests = {}  # source frame file -> content digest
+        self._sprite_cache = {}
+        self._sprite_max = 512  # caption sprites and composed karaoke lines
+        self.plan = plan if plan is not None else self.compile_plan()
+
+    def _px(self, v):
+        """A full-resolution pixel measure at this render's scale (at least 1)."""
+        return max(1, int(round(v * self.scale)))
 
     def _init_fonts(self):
         """Pre-load fonts once, not per-frame."""
@@ -290,90 +996,276 @@ class Compositor:
         font_size = cc.get("font_size", 52)
         self.font = _resolve_font(font_size, font_path)
         self._font_path = font_path
+        self._cap_color = tuple(cc.get("color", [255, 255, 255]))
+        self._cap_outline = tuple(cc.get("outline_color", [0, 0, 0]))
+        self._cap_accent = tuple(cc.get("accent_color", [255, 200, 50]))
+        self._cap_no_outline = cc.get("no_outline", False)
 
     def _preload_segments(self):
         """Count frames for each segment source and pre-load words."""
         for seg in self.cfg["segments"]:
             if seg["type"] in ("presenter", "screenrec"):
                 src = Path(seg["source"])
-                pat = seg.get("source_pattern", "f_%04d.jpg")
-                prefix = pat.split("%")[0] if "%" in pat else ""
-                seg["_n_frames"] = len(list(src.glob(f"{prefix}*")))
-                if seg["_n_frames"] == 0:
-                    print(f"  Warning: no frames found in {src} with pattern {pat}", file=sys.stderr)
+                if src.is_file():
+                    video = self._videos.get(seg["source"])
+                    if video is None:
+                        video = self._videos[seg["source"]] = VideoFrameSource(
+                            src, self.W, self.H, self.SRC_FPS)
+                    seg["_n_frames"] = video.n_frames
+                    if video.n_frames == 0:
+                        print(f"  Warning: could not probe video {src}", file=sys.stderr)
+                else:
+                    pat = seg.get("source_pattern", "f_%04d.jpg")
+                    prefix = pat.split("%")[0] if "%" in pat else ""
+                    seg["_n_frames"] = len(list(src.glob(f"{prefix}*")))
+                    if seg["_n_frames"] == 0:
+                        print(f"  Warning: no frames found in {src} with pattern {pat}", file=sys.stderr)
                 seg["_words"] = load_words(seg.get("words_json"))
+                seg["_timeline"] = WordTimeline(seg["_words"])
                 if seg.get("presenter_alpha"):
                     alpha_dir = Path(seg["presenter_alpha"])
                     seg["_n_alpha"] = len(list(alpha_dir.glob("*.png")))
 
     def _get_frame(self, seg, fidx):
-        """Load a frame from segment source with basic caching."""
-        src = Path(seg["source"])
-        pat = seg.get("source_pattern", "f_%04d.jpg")
-        n = seg.get("_n_frames", 1)
-        fi = min(max(1, fidx), n)
-        fp = src / (pat % fi)
-        cache_key = str(fp)
+        """Load a frame from segment source through the shared frame cache.
 
-        if cache_key in self._frame_cache:
-            return self._frame_cache[cache_key].copy()
-
-        if fp.exists():
-            img = Image.open(fp).convert("RGB")
-            if img.size != (self.W, self.H):
-                img = img.resize((self.W, self.H), Image.LANCZOS)
-        else:
-            img = Image.new("RGB", (self.W, self.H), (255, 255, 255))
-
-        # Evict old entries if cache is full
-        if len(self._frame_cache) >= self._cache_max:
-            oldest = next(iter(self._frame_cache))
-            del self._frame_cache[oldest]
-        self._frame_cache[cache_key] = img
-        return img.copy()
-
-    def _get_alpha_frame(self, seg, fidx):
-        """Load a cutout (RGBA) frame."""
-        alpha_dir = Path(seg["presenter_alpha"])
-        pat = seg.get("alpha_pattern", "lob_%04d.png")
-        n = seg.get("_n_alpha", 1)
+        The returned image is shared with the cache; copy it before drawing on it.
+        """
+        n = seg.get("_n_frames", 1)
         fi = min(max(1, fidx), n)
-        fp = alpha_dir / (pat % fi)
-        if fp.exists():
-            img = Image.open(fp).convert("RGBA")
+        video = self._videos.get(seg["source"])
+        if video is not None:
+            def load_video():
+                with self.prof.span("decode_video"):
+                    return video.read(fi)
+            # Decoded at SRC_FPS from this exact file, which a shared cache may outlive
+            return self._frames.get((video.stamp, self.SRC_FPS, fi), load_video)
+
+        fp = self._frame_path(seg, fi)
+
+        def load():
+            if not fp.exists():
+                return Image.new("RGB", (self.W, self.H), (255, 255, 255))
+            with self.prof.span("decode"):
+                img = Image.open(fp)
+                if self.scale < 1:
+                    img.draft("RGB", (self.W, self.H))  # JPEG: decode at reduced size
+                img = img.convert("RGB")
             if img.size != (self.W, self.H):
-                img = img.resize((self.W, self.H), Image.LANCZOS)
+                with self.prof.span("resize"):
+                    img = img.resize((self.W, self.H), self.resample)
             return img
-        return self._get_frame(seg, fidx).convert("RGBA")
 
-    def _get_screenrec_frame(self, seg, local_t):
-        """Get screen recording frame with optional time mapping and content cropping."""
+        return self._frames.get(str(fp), load)
+
+    def _get_alpha_layer(self, seg, fidx):
+        """Load a cutout (RGBA) frame as a cached PremultipliedLayer."""
+        fp = self._alpha_path(seg, fidx)
+
+        def load():
+            if fp.exists():
+                with self.prof.span("decode"):
+                    img = Image.open(fp).convert("RGBA")
+                if img.size != (self.W, self.H):
+                    with self.prof.span("resize"):
+                        img = img.resize((self.W, self.H), self.resample)
+            else:
+                img = self._get_frame(seg, fidx).convert("RGBA")
+            with self.prof.span("premultiply"):
+                return PremultipliedLayer(img)
+
+        return self._frames.get(("alpha", str(fp)), load)
+
+    def _frame_path(self, seg, fi):
+        """File of (already clamped) frame ``fi`` in a frame-directory segment."""
+        return Path(seg["source"]) / (seg.get("source_pattern", "f_%04d.jpg") % fi)
+
+    def _alpha_path(self, seg, fidx):
+        """File of cutout frame ``fidx``, clamped to the segment's alpha frames."""
+        fi = min(max(1, fidx), seg.get("_n_alpha", 1))
+        return Path(seg["presenter_alpha"]) / (seg.get("alpha_pattern", "lob_%04d.png") % fi)
+
+    def _source_digest(self, load, seg, fidx):
+        """Content digest of one source frame, as read by ``load``.
+
+        Frame files are hashed by their bytes (once per run), so a static
+        screen recorded as identical JPEGs fingerprints the same at every
+        index (frame_key leaves the indices out). Video frames are identified
+        by file (size, mtime), the fps they are decoded at and index.
+        """
+        if load == self._get_alpha_layer:
+            path = str(self._alpha_path(seg, fidx))
+        else:
+            fi = min(max(1, fidx), seg.get("_n_frames", 1))
+            video = self._videos.get(seg["source"])
+            if video is not None:
+                return f"{video.stamp}@{self.SRC_FPS}#{fi}"  # frame N differs per decode fps
+            path = str(self._frame_path(seg, fi))
+
+        digest = self._digests.get(path)
+        if digest is None:
+            try:
+                with open(path, "rb") as f:
+                    digest = hashlib.blake2b(f.read(), digest_size=16).hexdigest()
+            except OSError:
+                digest = f"missing:{path}"
+            self._digests[path] = digest
+        return digest
+
+    def frame_key(self, fi):
+        """Fingerprint of everything that determines output frame ``fi``'s pixels.
+
+        Two frames with the same key render identically, in this run or a
+        later one: the plan entry minus its timestamps, segment index and
+        source frame indices, caption progress clamped to where the caption animation settles,
+        the content digest of every source frame read, the look of the
+        segments drawn (SEGMENT_LOOK_KEYS), the output size and, for frames
+        with a caption, the caption config.
+        """
+        self.prof.frame(fi)
+        with self.prof.span("fingerprint"):
+            return self._frame_key(fi)
+
+    def _frame_key(self, fi):
+        entry = self.plan[fi]
+        e = {k: v for k, v in entry.items()
+             if k not in ("fi", "t", "local_t", "seg", "src_frame", "from_frame", "to_frame")}
+        if e.get("jump"):
+            e["jump"] = {"p": e["jump"]["p"]}  # pre/post frames are in "sources"
+        cap = e.get("caption")
+        if cap:
+            style = self.cap_cfg.get("style", "pop")
+            if style == "karaoke" and cap.get("group"):
+                settle = 0.4  # pop ends at 0.3, underline swipe at 0.15 + 0.25
+            elif style == "pop":
+                settle = 0.5  # pop ends at 0.3, underline swipe at 0.2 + 0.3
+            else:
+                settle = 0.0
+            e["caption"] = dict(cap, t_in_word=min(cap["t_in_word"], settle), cfg=self.cap_cfg)
+        e["sources"] = [self._source_digest(*src) for src in self._frame_sources(fi)]
+        if entry["seg"] is not None:
+            segments = self.cfg["segments"]
+            seg = segments[entry["seg"]]
+            drawn = [seg, segments[seg["to_segment"]]] if seg["type"] == "transition" else [seg]
+            e["look"] = [{k: s[k] for k in SEGMENT_LOOK_KEYS if k in s} for s in drawn]
+        e["size"] = [self.W, self.H]
+        if "preview_scale" in self.cfg:
+            # Drafts resample differently even at full size (--preview 1)
+            e["preview"] = [self.scale, int(self.resample)]
+        return hashlib.blake2b(json.dumps(e, sort_keys=True).encode(),
+                               digest_size=16).hexdigest()
+
+    def iter_frames(self, frames, keys=None):
+        """Yield (fi, image) for the frame indices in ``frames``, in order.
+
+        ``image`` is None when frame fi directly follows the previous one
+        and has the same frame_key, so the caller can repeat its previous
+        output instead of rendering and encoding the same pixels again.
+        ``keys``, if given, are the precomputed frame_keys of ``frames``.
+        """
+        frames = list(frames)
+        prefetcher = self._start_prefetch()
+        if prefetcher is not None:
+            prefetcher.schedule(frames)  # don't read past this run (e.g. a worker's chunk)
+        prev_fi = prev_key = None
+        for n, fi in enumerate(frames):
+            key = keys[n] if keys is not None else self.frame_key(fi)
+            if key == prev_key and fi == prev_fi + 1:
+                prev_fi = fi
+                yield fi, None
+                continue
+            prev_fi, prev_key = fi, key
+            yield fi, self.render_frame(fi)
+
+    def _frame_sources(self, fi):
+        """(loader, segment, frame) for every source frame plan entry ``fi`` reads."""
+        e = self.plan[fi]
+        stype = e["type"]
+        if stype is None or stype == "card":
+            return []
+        seg = self.cfg["segments"][e["seg"]]
+        if stype == "presenter":
+            return [(self._get_frame, seg, e["src_frame"])]
+        if stype == "screenrec":
+            jump = e["jump"]
+            if jump:
+                return [(self._get_frame, seg, jump["pre"]), (self._get_frame, seg, jump["post"])]
+            return [(self._get_frame, seg, e["src_frame"])]
+
+        all_segments = self.cfg["segments"]
+        from_seg = all_segments[seg["from_segment"]]
+        to_seg = all_segments[seg["to_segment"]]
+        sources = [(self._get_frame, to_seg, e["to_frame"])]
+        if e["mode"] != "overlay_dissolve":
+            sources.append((self._get_frame, from_seg, e["from_frame"]))
+        elif e["lob_opacity"] > 0:
+            sources.append((self._get_alpha_layer, from_seg, e["from_frame"]))
+        return sources
+
+    def close(self):
+        """Stop the prefetch thread and any video decoders."""
+        if self._prefetcher is not None:
+            self._prefetcher.close()
+            self._prefetcher = None
+        for video in self._videos.values():
+            video.close()
+
+    def _source_frame_index(self, seg, local_t):
+        """Source frame number (1-based) for a screenrec at local time, via time_map."""
+        return self._source_frame_indices(seg, [local_t])[0]
+
+    def _source_frame_indices(self, seg, local_ts):
+        """Source frame numbers for many local times at once (one np.interp pass)."""
+        src_t = np.asarray(local_ts, dtype=np.float64)
         tm = seg.get("time_map")
         if tm:
-            src_t = float(np.interp(local_t, tm["vo_times"], tm["src_times"]))
-        else:
-            src_t = local_t
+            src_t = np.interp(src_t, tm["vo_times"], tm["src_times"])
+        idx = (src_t * self.SRC_FPS).astype(np.int64) + 1
+        return np.minimum(np.maximum(idx, 1), seg.get("_n_frames", 1)).tolist()
 
-        fidx = int(src_t * self.FPS) + 1
+    def _get_screenrec_frame(self, seg, fidx):
+        """Get screen recording frame with content cropping for letterboxed sources."""
         img = self._get_frame(seg, fidx)
 
         # Content cropping for letterboxed sources
         bounds = seg.get("content_bounds")
         if bounds:
-            ct, cb = bounds
-            ch = cb - ct
-            content = img.crop((0, ct, self.W, cb))
-            result = Image.new("RGB", (self.W, self.H), (255, 255, 255))
-            result.paste(content, (0, (self.H - ch) // 2))
-            return result
+            with self.prof.span("crop"):
+                ct, cb = bounds
+                ch = cb - ct
+                content = img.crop((0, ct, self.W, cb))
+                result = Image.new("RGB", (self.W, self.H), (255, 255, 255))
+                result.paste(content, (0, (self.H - ch) // 2))
+                return result
         return img
 
-    def _apply_zoom(self, img, seg, local_t):
-        """Apply zoom based on segment zoom config with AR lock.
+    def _get_zoomed_screenrec_frame(self, seg, fidx, box):
+        """Zoomed screenrec frame resampled straight from the source frame.
+
+        The letterbox crop, zoom crop and scale-up fuse into one resize of
+        the box mapped into source coordinates. Boxes that come within the
+        filter's reach of the letterbox bars (which would bleed in) go through
+        the padded frame instead.
+        """
+        img = self._get_frame(seg, fidx)
+        bounds = seg.get("content_bounds")
+        if bounds:
+            ct, cb = bounds
+            shift = ct - (self.H - (cb - ct)) // 2  # padded frame y -> source y
+            reach = 3  # LANCZOS support, in source pixels, when scaling up
+            if box[1] + shift < ct + reach or box[3] + shift > cb - reach:
+                img = self._get_screenrec_frame(seg, fidx)
+            else:
+                box = [box[0], box[1] + shift, box[2], box[3] + shift]
+        with self.prof.span("zoom"):
+            return self._apply_zoom(img, box)
+
+    def _zoom_box(self, seg, local_t):
+        """Crop box (x1, y1, x2, y2) for the zoom active at local_t, or None.
         Supports single zoom dict or a list of zooms (first active wins)."""
         zoom_cfg = seg.get("zoom") or seg.get("zooms")
         if not zoom_cfg:
-            return img
+            return None
 
         # Normalize to list
         zoom_list = zoom_cfg if isinstance(zoom_cfg, list) else [zoom_cfg]
@@ -385,7 +1277,7 @@ class Compositor:
                 z = candidate
                 break
         if not z:
-            return img
+            return None
 
         t = local_t
         in_s, in_e = z["in_start"], z["in_end"]
@@ -393,7 +1285,7 @@ class Compositor:
         out_e = z["out_end"]
 
         if t < in_s or t >= out_e:
-            return img
+            return None
 
         if in_s <= t < in_e:
             p = (t - in_s) / (in_e - in_s)
@@ -424,27 +1316,85 @@ class Compositor:
             ct, cb = bounds
             content_h = cb - ct
             y_off = (self.H - content_h) // 2
-            y1 = max(y_off - 20, min(y_off + content_h - ch + 20, y1))
+            margin = self._px(20)
+            y1 = max(y_off - margin, min(y_off + content_h - ch + margin, y1))
+            y1 = max(0, min(self.H - ch, y1))  # the margin must not push the box off-frame
+
+        return [x1, y1, x1 + cw, y1 + ch]
 
-        return img.crop((x1, y1, x1 + cw, y1 + ch)).resize((self.W, self.H), Image.LANCZOS)
+    def _apply_zoom(self, img, box):
+        """Scale a zoom box of ``img`` up to the full frame (AR locked by _zoom_box).
 
-    def _smooth_jump(self, seg, img, local_t):
-        """Cross-fade over UI jump points in source video."""
-        jumps = seg.get("smooth_jumps", [])
+        The box is resampled in place, so there is no intermediate crop and the
+        filter sees the real pixels just outside the box.
+        """
+        if not box:
+            return img
+        box = tuple(int(round(v)) for v in box)  # whole pixels, as a crop would take
+        return img.resize((self.W, self.H), self.resample, box=box)
+
+    def _jump_state(self, seg, local_t):
+        """Cross-fade state over UI jump points in source video, or None."""
         HALF = 0.25
-        for jt in jumps:
+        ends = seg.get("_jump_frames")
+        if ends is None:
+            # Source frames either side of each jump, resolved once per segment
+            jumps = seg.get("smooth_jumps", [])
+            times = [t for jt in jumps for t in (jt - HALF, jt + HALF)]
+            frames = self._source_frame_indices(seg, times)
+            ends = seg["_jump_frames"] = [(jt, frames[2 * k], frames[2 * k + 1])
+                                          for k, jt in enumerate(jumps)]
+        for jt, pre, post in ends:
             if abs(local_t - jt) < HALF and local_t > jt - HALF:
-                pre_t = jt - HALF
-                post_t = jt + HALF
-                pre_img = self._get_screenrec_frame(seg, pre_t)
-                post_img = self._get_screenrec_frame(seg, post_t)
                 p = (local_t - (jt - HALF)) / (2 * HALF)
-                p = 0.5 - 0.5 * math.cos(p * math.pi)
-                return Image.blend(pre_img, post_img, p)
-        return img
+                return {"pre": pre, "post": post, "p": 0.5 - 0.5 * math.cos(p * math.pi)}
+        return None
+
+    def _text_sprite(self, text, font, fill):
+        """Return (sprite, dx, dy, w, h) for one outlined run of caption text.
+
+        The sprite is an RGBA layer drawn once with Pillow's native stroke and
+        cached; (dx, dy) is its offset from the text origin and (w, h) the
+        unstroked text box used for layout.
+        """
+        # Fonts live in _FONT_CACHE for the whole run, so id() is a stable key
+        key = ("text", text, id(font), fill)
+        hit = self._sprite_cache.get(key)
+        if hit is not None:
+            return hit
+
+        sw = 0 if self._cap_no_outline else self._px(3)
+        probe = ImageDraw.Draw(Image.new("L", (1, 1)))
+        bb = probe.textbbox((0, 0), text, font=font)
+        sb = probe.textbbox((0, 0), text, font=font, stroke_width=sw)
+        size = (max(1, sb[2] - sb[0]), max(1, sb[3] - sb[1]))
+        origin = (-sb[0], -sb[1])
+
+        # Build colour and coverage from L masks so antialiased edges blend
+        # against the outline colour, not against transparent black
+        body = Image.new("L", size, 0)
+        ImageDraw.Draw(body).text(origin, text, fill=255, font=font)
+        sprite = Image.new("RGBA", size, self._cap_outline + (0,))
+        sprite.paste(fill + (255,), (0, 0), body)
+        if sw:
+            cover = Image.new("L", size, 0)
+            ImageDraw.Draw(cover).text(origin, text, fill=255, font=font,
+                                       stroke_width=sw, stroke_fill=255)
+        else:
+            cover = body
+        sprite.putalpha(cover)
+
+        hit = (sprite, sb[0], sb[1], bb[2] - bb[0], bb[3] - bb[1])
+        self._cache_sprite(key, hit)
+        return hit
+
+    def _cache_sprite(self, key, value):
+        if len(self._sprite_cache) >= self._sprite_max:
+            del self._sprite_cache[next(iter(self._sprite_cache))]
+        self._sprite_cache[key] = value
 
     def _draw_caption(self, img, word_text, t_in_word, word_group=None, active_idx=-1):
-        """Draw pop/static/karaoke caption with cached fonts."""
+        """Draw pop/static/karaoke caption from cached text sprites."""
         if not self.cap_cfg.get("enabled") or not self.font:
             return img
         cc = self.cap_cfg
@@ -466,133 +1416,115 @@ class Compositor:
         base_size = cc.get("font_size", 52)
         fs = int(base_size * scale)
 
-        # Use cached font — only create a new one if scale changed the size
+        # The integer font size is the animation bucket: one sprite per size
         if fs == base_size:
             f = self.font
         else:
-            f = _resolve_font(max(20, fs), self._font_path)
+            f = _resolve_font(max(self._px(20), fs), self._font_path)
 
-        d = ImageDraw.Draw(img)
-        bb = d.textbbox((0, 0), text, font=f)
-        tw, th = bb[2] - bb[0], bb[3] - bb[1]
+        sprite, dx, dy, tw, th = self._text_sprite(text, f, self._cap_color)
         x = (self.W - tw) // 2
         y = self.H + cc.get("position_y", -130)
-
-        oc = tuple(cc.get("outline_color", [0, 0, 0]))
-        tc = tuple(cc.get("color", [255, 255, 255]))
-        ac = tuple(cc.get("accent_color", [255, 200, 50]))
-        no_outline = cc.get("no_outline", False)
-
-        # Outline (3px stroke) — skip if no_outline
-        if not no_outline:
-            for dx in range(-3, 4):
-                for dy in range(-3, 4):
-                    if dx * dx + dy * dy <= 9:
-                        d.text((x + dx, y + dy), text, fill=oc, font=f)
-        d.text((x, y), text, fill=tc, font=f)
+        img.paste(sprite, (x + dx, y + dy), sprite)
 
         # Accent underline swipe
         if style == "pop" and t_in_word > 0.2:
             lp = min(1.0, (t_in_word - 0.2) / 0.3)
             lw = int(tw * lp)
             lx = x + (tw - lw) // 2
-            d.rectangle([lx, y + th + 4, lx + lw, y + th + 8], fill=ac)
+            ImageDraw.Draw(img).rectangle([lx, y + th + self._px(4), lx + lw, y + th + self._px(8)],
+                                          fill=self._cap_accent)
 
         return img
 
-    def _draw_karaoke(self, img, word_group, active_idx, t_in_word):
-        """Draw karaoke-style caption: full line visible, active word highlighted with pop."""
-        cc = self.cap_cfg
-        base_size = cc.get("font_size", 52)
+    def _karaoke_line(self, words_text, active_idx, pop_fs):
+        """Return (layer, dx, dy, line_w, th, active_x, active_w) for a karaoke line.
+
+        The whole line is composited from word sprites once per
+        (words, active word, pop size) and cached as a single RGBA layer.
+        Offsets are relative to the line origin.
+        """
+        key = ("karaoke", tuple(words_text), active_idx, pop_fs)
+        hit = self._sprite_cache.get(key)
+        if hit is not None:
+            return hit
+
         f = self.font
-        d = ImageDraw.Draw(img)
-        oc = tuple(cc.get("outline_color", [0, 0, 0]))
-        tc = tuple(cc.get("color", [255, 255, 255]))
-        ac = tuple(cc.get("accent_color", [255, 200, 50]))
+        tc = self._cap_color
+        ac = self._cap_accent
         dim = tuple(max(0, c - 80) for c in tc)  # dimmed white for inactive words
-        no_outline = cc.get("no_outline", False)
 
-        # Build full line text and measure
-        words_text = [w["word"] for w in word_group]
-        sep = ""  # no space for CJK; detect if Latin
         sample = "".join(words_text)
         is_cjk = any('\u4e00' <= c <= '\u9fff' for c in sample)
         sep = "" if is_cjk else " "
-        full_line = sep.join(words_text)
+        sep_w = self._text_sprite(sep, f, tc)[3] if sep else 0
 
-        bb = d.textbbox((0, 0), full_line, font=f)
-        total_w = bb[2] - bb[0]
-        th = bb[3] - bb[1]
-        line_x = (self.W - total_w) // 2
-        y = self.H + cc.get("position_y", -130)
-
-        # Active word pop scale
-        pop_scale = 1.0
-        if t_in_word < 0.3:
-            pop_scale = 1.0 + 0.12 * math.sin(min(t_in_word / 0.3, 1.0) * math.pi)
+        probe = ImageDraw.Draw(Image.new("L", (1, 1)))
+        bb = probe.textbbox((0, 0), sep.join(words_text), font=f)
+        line_w, th = bb[2] - bb[0], bb[3] - bb[1]
 
-        # Draw each word individually
-        cursor_x = line_x
+        # Lay out each word: (sprite, x, y) relative to the line origin
+        parts = []
+        cursor_x = 0
+        active_x = active_w = 0
         for i, wt in enumerate(words_text):
-            wbb = d.textbbox((0, 0), wt, font=f)
-            ww = wbb[2] - wbb[0]
-
             if i == active_idx:
-                # Active word: accent color + pop scale
-                if pop_scale > 1.0:
-                    pop_fs = int(base_size * pop_scale)
-                    pop_f = _resolve_font(max(20, pop_fs), self._font_path)
-                    pbb = d.textbbox((0, 0), wt, font=pop_f)
-                    pw, ph = pbb[2] - pbb[0], pbb[3] - pbb[1]
+                ww = self._text_sprite(wt, f, ac)[3]
+                if pop_fs is not None:
+                    pop_f = _resolve_font(max(self._px(20), pop_fs), self._font_path)
+                    sprite, dx, dy, pw, ph = self._text_sprite(wt, pop_f, ac)
                     px = cursor_x - (pw - ww) // 2
-                    py = y - (ph - th) // 2
-                    if not no_outline:
-                        for dx in range(-3, 4):
-                            for dy in range(-3, 4):
-                                if dx * dx + dy * dy <= 9:
-                                    d.text((px + dx, py + dy), wt, fill=oc, font=pop_f)
-                    d.text((px, py), wt, fill=ac, font=pop_f)
+                    py = -((ph - th) // 2)
                 else:
-                    if not no_outline:
-                        for dx in range(-3, 4):
-                            for dy in range(-3, 4):
-                                if dx * dx + dy * dy <= 9:
-                                    d.text((cursor_x + dx, y + dy), wt, fill=oc, font=f)
-                    d.text((cursor_x, y), wt, fill=ac, font=f)
-
-                # Underline swipe on active word
-                if t_in_word > 0.15:
-                    lp = min(1.0, (t_in_word - 0.15) / 0.25)
-                    lw = int(ww * lp)
-                    lx = cursor_x + (ww - lw) // 2
-                    d.rectangle([lx, y + th + 4, lx + lw, y + th + 8], fill=ac)
+                    sprite, dx, dy, _, _ = self._text_sprite(wt, f, ac)
+                    px, py = cursor_x, 0
+                active_x, active_w = cursor_x, ww
             else:
-                # Inactive word: dimmed or white
                 word_color = tc if i < active_idx else dim
-                if not no_outline:
-                    for dx in range(-3, 4):
-                        for dy in range(-3, 4):
-                            if dx * dx + dy * dy <= 9:
-                                d.text((cursor_x + dx, y + dy), wt, fill=oc, font=f)
-                d.text((cursor_x, y), wt, fill=word_color, font=f)
-
-            cursor_x += ww
-            if sep:
-                sbb = d.textbbox((0, 0), sep, font=f)
-                cursor_x += sbb[2] - sbb[0]
+                sprite, dx, dy, ww, _ = self._text_sprite(wt, f, word_color)
+                px, py = cursor_x, 0
+            parts.append((sprite, px + dx, py + dy))
+            cursor_x += ww + sep_w
+
+        x0 = min(px for _, px, _ in parts)
+        y0 = min(py for _, _, py in parts)
+        x1 = max(px + s.width for s, px, _ in parts)
+        y1 = max(py + s.height for s, _, py in parts)
+        layer = Image.new("RGBA", (x1 - x0, y1 - y0), (0, 0, 0, 0))
+        for sprite, px, py in parts:
+            layer.alpha_composite(sprite, (px - x0, py - y0))
+
+        hit = (layer, x0, y0, line_w, th, active_x, active_w)
+        self._cache_sprite(key, hit)
+        return hit
 
-        return img
+    def _draw_karaoke(self, img, word_group, active_idx, t_in_word):
+        """Draw karaoke-style caption: full line visible, active word highlighted with pop."""
+        cc = self.cap_cfg
+        base_size = cc.get("font_size", 52)
+
+        # Active word pop scale, bucketed by the integer font size it produces
+        pop_fs = None
+        if t_in_word < 0.3:
+            pop_scale = 1.0 + 0.12 * math.sin(min(t_in_word / 0.3, 1.0) * math.pi)
+            if pop_scale > 1.0:
+                pop_fs = int(base_size * pop_scale)
+
+        layer, dx, dy, line_w, th, ax, aw = self._karaoke_line(
+            list(word_group), active_idx, pop_fs)
+        line_x = (self.W - line_w) // 2
+        y = self.H + cc.get("position_y", -130)
+        img.paste(layer, (line_x + dx, y + dy), layer)
+
+        # Underline swipe on active word
+        if t_in_word > 0.15:
+            lp = min(1.0, (t_in_word - 0.15) / 0.25)
+            lw = int(aw * lp)
+            lx = line_x + ax + (aw - lw) // 2
+            ImageDraw.Draw(img).rectangle([lx, y + th + self._px(4), lx + lw, y + th + self._px(8)],
+                                          fill=self._cap_accent)
 
-    def _overlay_alpha(self, bg, fg_rgba, opacity=1.0):
-        """Composite RGBA foreground onto RGB background."""
-        bg_rgba = bg.convert("RGBA")
-        fg = fg_rgba.copy()
-        if opacity < 1.0:
-            r, g, b, a = fg.split()
-            a = a.point(lambda x: int(x * opacity))
-            fg = Image.merge("RGBA", (r, g, b, a))
-        bg_rgba.paste(fg, (0, 0), fg)
-        return bg_rgba.convert("RGB")
+        return img
 
     def _build_timeline(self):
         """Build segment timeline with proper start times. Transitions consume time sequentially."""
@@ -601,99 +1533,121 @@ class Compositor:
         timeline = []
         t_cursor = 0.0
         for idx, seg in enumerate(segments):
-            timeline.append({"start": t_cursor, "seg": seg, "idx": idx})
+            timeline.append({"start": t_cursor, "seg": seg, "idx": idx,
+                             "gap": 0.5 if idx in gap_after else 0})
             t_cursor += seg["duration"]
             if idx in gap_after:
                 t_cursor += 0.5
         return timeline, t_cursor
 
-    def compose(self, out_dir):
-        """Compose all frames to out_dir."""
-        out_dir = Path(out_dir)
-        out_dir.mkdir(parents=True, exist_ok=True)
+    def compile_plan(self):
+        """Resolve the config into a flat per-frame render plan.
 
+        Each entry records everything that varies per frame — segment, local
+        time, source frame index, zoom crop box, jump cross-fade, transition
+        mix and caption state — so rendering is a walk over the list and
+        never touches the timeline. Entries are plain JSON (see --dump-plan)
+        and are shipped to worker processes as-is.
+        """
         timeline, total_dur = self._build_timeline()
         total_frames = int(total_dur * self.FPS)
-
-        print(f"Composing {total_frames} frames ({total_dur:.1f}s) @ {self.FPS}fps...")
-        t_start = time.time()
-
+        starts = [entry["start"] for entry in timeline]
+        slots = []  # (t, segment index, local time) per output frame
         for fi in range(total_frames):
             t = fi / self.FPS
-            out_path = out_dir / f"f_{fi + 1:04d}.jpg"  # 1-indexed to match prep_source output
-
-            if fi % 150 == 0 and fi > 0:
-                elapsed = time.time() - t_start
-                fps_rate = fi / elapsed
-                eta = (total_frames - fi) / fps_rate
-                print(f"  {fi}/{total_frames} ({t:.1f}s) — {fps_rate:.1f} fps, ETA {eta:.0f}s")
-            elif fi == 0:
-                print(f"  {fi}/{total_frames} ({t:.1f}s)")
-
-            # Find active segment (last matching in timeline order)
-            img = Image.new("RGB", (self.W, self.H), (255, 255, 255))
-            for entry in reversed(timeline):
-                seg = entry["seg"]
-                seg_start = entry["start"]
-                seg_end = seg_start + seg["duration"]
-                gap = 0.5 if entry["idx"] in set(self.cfg.get("audio_mix", {}).get("gap_after_segments", [])) else 0
-                if seg_start <= t < seg_end + gap:
-                    local_t = t - seg_start
-
-                    if seg["type"] == "presenter":
-                        fidx = min(int(local_t * self.FPS) + 1, seg["_n_frames"])
-                        img = self._get_frame(seg, fidx)
-                        w = active_word(seg["_words"], local_t)
-                        if w:
-                            img = self._draw_caption(img, w["word"], word_progress(w, local_t))
-
-                    elif seg["type"] == "screenrec":
-                        img = self._get_screenrec_frame(seg, local_t)
-                        img = self._smooth_jump(seg, img, local_t)
-                        img = self._apply_zoom(img, seg, local_t)
-                        cap_style = self.cap_cfg.get("style", "pop")
-                        if cap_style == "karaoke":
-                            grp, aidx = active_word_group(seg["_words"], local_t)
-                            if grp and aidx >= 0:
-                                img = self._draw_caption(img, grp[aidx]["word"],
-                                    word_progress(grp[aidx], local_t), grp, aidx)
-                        else:
-                            w = active_word(seg["_words"], local_t)
-                            if w:
-                                img = self._draw_caption(img, w["word"], word_progress(w, local_t))
-
-                    elif seg["type"] == "transition":
-                        img = self._render_transition(seg, self.cfg["segments"], timeline, local_t)
-
-                    elif seg["type"] == "card":
-                        img = self._render_card(seg)
-
-                    break
-
-            img.save(out_path, quality=92)
-
-        elapsed = time.time() - t_start
-        print(f"Done! {total_frames} frames in {elapsed:.1f}s ({total_frames/elapsed:.1f} fps)")
-        return total_frames, total_dur
+            entry = None
+            # Segments are contiguous, so the active one is the last to start at or before t
+            k = bisect_right(starts, t) - 1
+            if k >= 0:
+                cand = timeline[k]
+                if t < cand["start"] + cand["seg"]["duration"] + cand["gap"]:
+                    entry = cand
+            if entry is None:
+                slots.append((t, None, None))
+            else:
+                slots.append((t, entry["idx"], t - entry["start"]))
 
-    def _render_transition(self, seg, all_segments, timeline, local_t):
-        """Render overlay_dissolve or crossfade transition."""
+        # Time-map lookup table: every screenrec frame's source index in one pass per segment
+        segments = self.cfg["segments"]
+        seg_frames = {}
+        for fi, (_, idx, _) in enumerate(slots):
+            if idx is not None and segments[idx]["type"] == "screenrec":
+                seg_frames.setdefault(idx, []).append(fi)
+        src_frames = {}
+        for idx, frames in seg_frames.items():
+            indices = self._source_frame_indices(segments[idx], [slots[fi][2] for fi in frames])
+            src_frames.update(zip(frames, indices))
+
+        plan = []
+        for fi, (t, idx, local_t) in enumerate(slots):
+            if idx is None:
+                plan.append({"fi": fi, "t": t, "seg": None, "type": None})
+            else:
+                plan.append(self._plan_frame(fi, t, idx, local_t, src_frames.get(fi)))
+        return plan
+
+    def _plan_frame(self, fi, t, idx, local_t, src_frame=None):
+        """Plan entry for output frame fi inside segment idx.
+
+        ``src_frame`` is a screenrec's precomputed source frame for this time.
+        """
+        seg = self.cfg["segments"][idx]
+        stype = seg["type"]
+        e = {"fi": fi, "t": t, "seg": idx, "type": stype, "local_t": local_t}
+
+        if stype == "presenter":
+            e["src_frame"] = min(int(local_t * self.SRC_FPS) + 1, seg["_n_frames"])
+            e["caption"] = self._caption_state(seg["_timeline"], local_t)
+
+        elif stype == "screenrec":
+            if src_frame is None:
+                src_frame = self._source_frame_index(seg, local_t)
+            e["src_frame"] = src_frame
+            e["jump"] = self._jump_state(seg, local_t)
+            e["zoom"] = self._zoom_box(seg, local_t)
+            e["caption"] = self._caption_state(seg["_timeline"], local_t,
+                                               group=self.cap_cfg.get("style", "pop") == "karaoke")
+
+        elif stype == "transition":
+            e.update(self._plan_transition(seg, local_t))
+
+        return e
+
+    def _caption_state(self, words, local_t, group=False):
+        """Caption to draw at local_t: word, progress into it and (karaoke) its line.
+
+        ``words`` is the segment's WordTimeline.
+        """
+        if words is None:
+            return None
+        if group:
+            grp, aidx = words.group_at(local_t)
+            if not grp or aidx < 0:
+                return None
+            return {"word": grp[aidx]["word"], "t_in_word": word_progress(grp[aidx], local_t),
+                    "group": [w["word"] for w in grp], "active": aidx}
+        w = words.word_at(local_t)
+        if not w:
+            return None
+        return {"word": w["word"], "t_in_word": word_progress(w, local_t)}
+
+    def _plan_transition(self, seg, local_t):
+        """Per-frame state of a transition: mode, mix amount and endpoint frames."""
         mode = seg.get("mode", "crossfade")
         dur = seg["duration"]
+        all_segments = self.cfg["segments"]
         from_seg = all_segments[seg["from_segment"]]
         to_seg = all_segments[seg["to_segment"]]
+        if to_seg["type"] == "screenrec":
+            to_frame = self._source_frame_index(to_seg, 0)
+        else:
+            to_frame = 1
+        e = {"to_frame": to_frame}
 
         if mode == "overlay_dissolve" and from_seg.get("presenter_alpha"):
             # Presenter cutout fades out while BG fades in
             bg_progress = min(1.0, local_t / seg.get("bg_fade_dur", dur))
-            bg_alpha = 0.5 - 0.5 * math.cos(bg_progress * math.pi)
-
-            white = Image.new("RGB", (self.W, self.H), (255, 255, 255))
-            if to_seg["type"] == "screenrec":
-                to_img = self._get_screenrec_frame(to_seg, 0)
-            else:
-                to_img = self._get_frame(to_seg, 1)
-            bg = Image.blend(white, to_img, bg_alpha)
+            e["bg_alpha"] = 0.5 - 0.5 * math.cos(bg_progress * math.pi)
 
             # Presenter fade
             fade_start = seg.get("presenter_fade_start", 0.5)
@@ -705,44 +1659,320 @@ class Compositor:
                 lob_opacity = max(0, 0.5 + 0.5 * math.cos(fp * math.pi))
             else:
                 lob_opacity = 0.0
-
-            if lob_opacity > 0:
-                n = from_seg.get("_n_frames", 1)
-                lob_rgba = self._get_alpha_frame(from_seg, n)
-                bg = self._overlay_alpha(bg, lob_rgba, lob_opacity)
+            e["mode"] = "overlay_dissolve"
+            e["lob_opacity"] = lob_opacity
+            e["from_frame"] = from_seg.get("_n_frames", 1)
 
             # Captions from presenter words if still speaking
             from_t = from_seg["duration"] - (seg["duration"] - local_t)
-            w = active_word(from_seg.get("_words", []), from_t)
-            if w:
-                bg = self._draw_caption(bg, w["word"], word_progress(w, from_t))
-            return bg
+            e["caption"] = self._caption_state(from_seg.get("_timeline"), from_t)
 
         elif mode == "wipe":
             # Left-to-right wipe
             progress = local_t / dur
             progress = 0.5 - 0.5 * math.cos(progress * math.pi)
-            from_img = self._get_frame(from_seg, from_seg.get("_n_frames", 1))
-            if to_seg["type"] == "screenrec":
-                to_img = self._get_screenrec_frame(to_seg, 0)
-            else:
-                to_img = self._get_frame(to_seg, 1)
-            split_x = int(self.W * progress)
-            result = from_img.copy()
-            if split_x > 0:
-                result.paste(to_img.crop((0, 0, split_x, self.H)), (0, 0))
-            return result
+            e["mode"] = "wipe"
+            e["split_x"] = int(self.W * progress)
+            e["from_frame"] = from_seg.get("_n_frames", 1)
 
         else:
             # Simple crossfade
             alpha = local_t / dur
-            alpha = 0.5 - 0.5 * math.cos(alpha * math.pi)
-            from_img = self._get_frame(from_seg, from_seg.get("_n_frames", 1))
-            if to_seg["type"] == "screenrec":
-                to_img = self._get_screenrec_frame(to_seg, 0)
+            e["mode"] = "crossfade"
+            e["alpha"] = 0.5 - 0.5 * math.cos(alpha * math.pi)
+            e["from_frame"] = from_seg.get("_n_frames", 1)
+
+        return e
+
+    def compose(self, out_dir, workers=1, incremental=True):
+        """Compose all frames to out_dir, optionally split across worker processes.
+
+        With ``incremental``, frames whose frame_key matches the manifest of
+        the previous run into out_dir are kept (or relinked) instead of
+        re-rendered.
+        """
+        out_dir = Path(out_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+
+        total_frames = len(self.plan)
+        total_dur = self._build_timeline()[1]
+
+        print(f"Composing {total_frames} frames ({total_dur:.1f}s) @ {self.FPS}fps...")
+        t_start = time.time()
+
+        keys = [self.frame_key(fi) for fi in range(total_frames)]
+        old_keys = load_manifest(out_dir) if incremental else []
+        discard_manifest(out_dir)  # rewritten once every frame matches `keys`
+        if incremental:
+            todo = reuse_previous_output(out_dir, keys, old_keys)
+            if len(todo) < total_frames:
+                print(f"  {total_frames - len(todo)} frames unchanged since the last run, "
+                      f"rendering {len(todo)}")
+        else:
+            todo = list(range(total_frames))
+
+        if workers > 1 and len(todo) > 1:
+            reused = self._compose_parallel(out_dir, todo, keys, workers, t_start)
+        else:
+            reused = 0
+            for n, (fi, img) in enumerate(self.iter_frames(todo, [keys[fi] for fi in todo])):
+                if n % 150 == 0 and n > 0:
+                    _print_progress(n, len(todo), self.FPS, t_start)
+                elif n == 0:
+                    print(f"  {fi}/{total_frames} ({fi / self.FPS:.1f}s)")
+                if img is None:
+                    _link_previous_frame(out_dir, fi)
+                    reused += 1
+                else:
+                    self._save_frame(img, out_dir, fi)
+            self.close()
+        save_manifest(out_dir, keys)
+
+        elapsed = time.time() - t_start
+        print(f"Done! {len(todo)} of {total_frames} frames in {elapsed:.1f}s "
+              f"({len(todo)/max(elapsed, 1e-9):.1f} fps), {reused} reused")
+        return total_frames, total_dur
+
+    def encode(self, output, audio=None, workers=1):
+        """Compose all frames and stream them as raw RGB into ffmpeg.
+
+        Frames go straight to ffmpeg's stdin while composition runs, so there
+        is no intermediate JPEG encode/decode and no temp directory, and
+        encoding overlaps with rendering.
+        """
+        total_frames = len(self.plan)
+        total_dur = self._build_timeline()[1]
+
+        cmd = [
+            "ffmpeg", "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{self.W}x{self.H}",
+            "-r", str(self.FPS), "-i", "-",
+        ]
+        if audio:
+            cmd += ["-i", audio]
+        cmd += [
+            "-c:v", "libx264", "-preset", "fast", "-crf", "23",
+            "-pix_fmt", "yuv420p", "-vf", "setsar=1",
+        ]
+        if audio:
+            cmd += ["-c:a", "copy", "-map", "0:v", "-map", "1:a"]
+        cmd.append(str(output))
+
+        print(f"Composing {total_frames} frames ({total_dur:.1f}s) @ {self.FPS}fps → {output}")
+        t_start = time.time()
+        proc = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+        reused = 0
+        prev = None
+        try:
+            for fi, frame in enumerate(self._iter_frame_bytes(total_frames, workers)):
+                if fi % 150 == 0 and fi > 0:
+                    _print_progress(fi, total_frames, self.FPS, t_start)
+                reused += frame is prev
+                prev = frame
+                self.prof.frame(fi)
+                with self.prof.span("pipe_write"):
+                    proc.stdin.write(frame)
+        except BrokenPipeError:
+            pass  # ffmpeg exited early; its return code says why
+        finally:
+            proc.stdin.close()
+            returncode = proc.wait()
+        if returncode:
+            raise subprocess.CalledProcessError(returncode, cmd)
+
+        elapsed = time.time() - t_start
+        print(f"Done! {total_frames} frames in {elapsed:.1f}s ({total_frames/elapsed:.1f} fps), "
+              f"{reused} reused")
+        return total_frames, total_dur
+
+    def _iter_frame_bytes(self, total_frames, workers):
+        """Yield raw RGB bytes for every frame, in order.
+
+        A reused frame is yielded as the very same bytes object as the frame
+        before it.
+        """
+        if workers <= 1:
+            try:
+                yield from _frame_bytes(self.iter_frames(range(total_frames)), self.prof)
+            finally:
+                self.close()
+            return
+
+        # Small chunks with a bounded number in flight keep memory flat
+        # when ffmpeg is slower than the workers.
+        chunk = 8
+        ranges = iter([(s, min(s + chunk, total_frames)) for s in range(0, total_frames, chunk)])
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=self._worker_args()) as pool:
+            pending = deque(pool.submit(_render_range_bytes, s, e)
+                            for s, e in islice(ranges, workers * 2))
+            while pending:
+                frames, events = pending.popleft().result()
+                self.prof.merge(events)
+                nxt = next(ranges, None)
+                if nxt:
+                    pending.append(pool.submit(_render_range_bytes, *nxt))
+                yield from frames
+
+    def _worker_args(self):
+        """Initializer args that rebuild this Compositor in a worker process."""
+        return (self.cfg, self.plan, self._frames.budget / (1024 * 1024), self._prefetch_depth,
+                self.prof.enabled)
+
+    def _save_frame(self, img, out_dir, fi):
+        out_path = out_dir / f"f_{fi + 1:04d}.jpg"  # 1-indexed to match prep_source output
+        with self.prof.span("save"):
+            if out_path.exists():
+                out_path.unlink()  # may be a hardlink shared with a reused frame
+            img.save(out_path, quality=92)
+
+    def _compose_parallel(self, out_dir, todo, keys, workers, t_start):
+        """Render runs of the frames in ``todo`` on worker processes.
+
+        Each worker builds its own Compositor once from the shared render
+        plan (own frame and font caches) and writes its frames straight to
+        out_dir. Chunks are runs of consecutive frames so per-worker caches
+        keep their locality; output is identical to the serial path since
+        every frame is rendered by the same code.
+        """
+        chunk = max(int(self.FPS), math.ceil(len(todo) / (workers * 4)))
+        chunks = [todo[s:s + chunk] for s in range(0, len(todo), chunk)]
+        print(f"  {workers} workers, {len(chunks)} chunks of up to {chunk} frames")
+        done = 0
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=self._worker_args()) as pool:
+            futures = [pool.submit(_compose_frames, str(out_dir), c, [keys[fi] for fi in c])
+                       for c in chunks]
+            reused = 0
+            for fut in as_completed(futures):
+                n, n_reused, events = fut.result()
+                self.prof.merge(events)
+                done += n
+                reused += n_reused
+                _print_progress(done, len(todo), self.FPS, t_start)
+        return reused
+
+    def _start_prefetch(self):
+        """The prefetch thread (started on first use), or None if prefetch is off."""
+        if self._prefetch_depth > 0 and self._prefetcher is None:
+            self._prefetcher = FramePrefetcher(self, self._prefetch_depth)
+        return self._prefetcher
+
+    def render_frame(self, fi):
+        """Render output frame ``fi`` (0-indexed) from the render plan as an RGB image."""
+        prefetcher = self._start_prefetch()
+        if prefetcher is not None:
+            prefetcher.advance(fi)
+
+        self.prof.frame(fi)
+        with self.prof.span("render"):
+            return self._render_entry(self.plan[fi])
+
+    def _render_entry(self, e):
+        prof = self.prof
+        stype = e["type"]
+        if stype is None:
+            return Image.new("RGB", (self.W, self.H), (255, 255, 255))
+        seg = self.cfg["segments"][e["seg"]]
+
+        if stype == "presenter":
+            img = self._get_frame(seg, e["src_frame"])
+
+        elif stype == "screenrec":
+            jump = e["jump"]
+            if jump:
+                # Both sides of a jump are fixed source frames: crop them once per jump
+                owner = ("jump", e["seg"], jump["pre"], jump["post"])
+                pre = self._held_frame(owner, "pre",
+                                       lambda: self._get_screenrec_frame(seg, jump["pre"]))
+                post = self._held_frame(owner, "post",
+                                        lambda: self._get_screenrec_frame(seg, jump["post"]))
+                with prof.span("jump_blend"):
+                    img = Image.blend(pre, post, jump["p"])
+                if e["zoom"]:
+                    with prof.span("zoom"):
+                        img = self._apply_zoom(img, e["zoom"])
+            elif e["zoom"]:
+                img = self._get_zoomed_screenrec_frame(seg, e["src_frame"], e["zoom"])
             else:
-                to_img = self._get_frame(to_seg, 1)
-            return Image.blend(from_img, to_img, alpha)
+                img = self._get_screenrec_frame(seg, e["src_frame"])
+
+        elif stype == "transition":
+            img = self._render_transition(e["seg"], seg, e)
+
+        else:
+            with prof.span("card"):
+                img = self._render_card(seg)
+
+        cap = e.get("caption")
+        if cap:
+            with prof.span("caption"):
+                if self._frames.holds(img):
+                    img = img.copy()  # never draw on a cached source frame
+                img = self._draw_caption(img, cap["word"], cap["t_in_word"],
+                                         cap.get("group"), cap.get("active", -1))
+        return img
+
+    def _render_transition(self, idx, seg, e):
+        """Render overlay_dissolve, wipe or crossfade transition from its plan entry."""
+        all_segments = self.cfg["segments"]
+        from_seg = all_segments[seg["from_segment"]]
+        to_seg = all_segments[seg["to_segment"]]
+
+        def load_to():
+            if to_seg["type"] == "screenrec":
+                return self._get_screenrec_frame(to_seg, e["to_frame"])
+            return self._get_frame(to_seg, e["to_frame"])
+
+        owner = ("transition", idx)
+        if e["mode"] == "overlay_dissolve":
+            to_arr = self._held_frame(owner, "to_array", lambda: np.asarray(load_to()))
+            layer = None
+            if e["lob_opacity"] > 0:
+                layer = self._held_frame(owner, "from_layer", lambda: self._get_alpha_layer(
+                    from_seg, e["from_frame"]))
+            with self.prof.span("transition"):
+                out, tmp, tmp2 = self._composite_buffers()
+                fade_into(out, to_arr, e["bg_alpha"], 255, tmp)
+                if layer is not None:
+                    overlay_into(out, layer, e["lob_opacity"], tmp, tmp2)
+                return Image.fromarray(out)
+
+        to_img = self._held_frame(owner, "to", load_to)
+        from_img = self._held_frame(owner, "from",
+                                    lambda: self._get_frame(from_seg, e["from_frame"]))
+        with self.prof.span("transition"):
+            if e["mode"] == "wipe":
+                split_x = e["split_x"]
+                result = from_img.copy()
+                if split_x > 0:
+                    result.paste(to_img.crop((0, 0, split_x, self.H)), (0, 0))
+                return result
+
+            return Image.blend(from_img, to_img, e["alpha"])
+
+    def _held_frame(self, owner, name, load):
+        """Still frame ``name`` of a transition or jump ``owner``, prepared on first use.
+
+        Both ends of a transition and both sides of a smooth jump are fixed
+        frames, so their letterbox crop, cutout layer or array view is built
+        once and every frame after the first costs only the blend. Only the
+        current owner's frames are held.
+        """
+        if self._held_for != owner:
+            self._held_for, self._held = owner, {}
+        img = self._held.get(name)
+        if img is None:
+            img = self._held[name] = load()
+        return img
+
+    def _composite_buffers(self):
+        """Preallocated (out uint8, scratch uint16, scratch uint16) frame buffers."""
+        if self._buffers is None:
+            shape = (self.H, self.W, 3)
+            self._buffers = (np.empty(shape, np.uint8), np.empty(shape, np.uint16),
+                             np.empty(shape, np.uint16))
+        return self._buffers
 
     def _render_card(self, seg):
         """Render a title/CTA card."""
@@ -755,13 +1985,73 @@ class Compositor:
         text = seg.get("text", "")
         if text:
             d = ImageDraw.Draw(img)
-            f = _resolve_font(64)
+            f = _resolve_font(self._px(64))
             bb = d.textbbox((0, 0), text, font=f)
             tw, th = bb[2] - bb[0], bb[3] - bb[1]
             d.text(((self.W - tw) // 2, (self.H - th) // 2), text, fill=(0, 0, 0), font=f)
         return img
 
 
+# ---------------------------------------------------------------------------
+# Parallel rendering
+# ---------------------------------------------------------------------------
+
+_worker_comp = None
+
+
+def _init_worker(config, plan, cache_mb, prefetch, profile):
+    """Process-pool initializer: one warm Compositor per worker process."""
+    global _worker_comp
+    _worker_comp = Compositor(config, plan, cache_mb=cache_mb, prefetch=prefetch, profile=profile)
+
+
+def _compose_frames(out_dir, frames, keys):
+    """Render the given frames with this worker's Compositor.
+
+    Returns (frames written, frames reused from the previous one, profile spans).
+    """
+    out_dir = Path(out_dir)
+    reused = 0
+    for fi, img in _worker_comp.iter_frames(frames, keys):
+        if img is None:
+            _link_previous_frame(out_dir, fi)
+            reused += 1
+        else:
+            _worker_comp._save_frame(img, out_dir, fi)
+    return len(frames), reused, _worker_comp.prof.drain()
+
+
+def _render_range_bytes(start, end):
+    """Render frames [start, end); returns (their raw RGB bytes, profile spans)."""
+    # Repeats are the same object, which pickle sends back only once
+    frames = list(_frame_bytes(_worker_comp.iter_frames(range(start, end)), _worker_comp.prof))
+    return frames, _worker_comp.prof.drain()
+
+
+def _frame_bytes(frames, prof):
+    """Raw RGB bytes for (fi, image) pairs from iter_frames, repeating the
+    previous bytes object for reused frames."""
+    data = None
+    for fi, img in frames:
+        if img is not None:
+            prof.frame(fi)
+            with prof.span("to_bytes"):
+                data = img.tobytes()
+        yield data
+
+
+def _link_previous_frame(out_dir, fi):
+    """Write output frame fi as a hardlink to frame fi - 1 (copy if links fail)."""
+    _link_or_copy(out_dir / f"f_{fi:04d}.jpg", out_dir / f"f_{fi + 1:04d}.jpg")
+
+
+def _print_progress(done, total_frames, fps, t_start):
+    elapsed = time.time() - t_start
+    fps_rate = done / elapsed if elapsed > 0 else 0.0
+    eta = (total_frames - done) / fps_rate if fps_rate else 0.0
+    print(f"  {done}/{total_frames} ({done / fps:.1f}s) — {fps_rate:.1f} fps, ETA {eta:.0f}s")
+
+
 # ---------------------------------------------------------------------------
 # Main
 # ---------------------------------------------------------------------------
@@ -775,6 +2065,25 @@ def main():
     group.add_argument("--output", help="Output video file (auto-encodes with ffmpeg)")
     parser.add_argument("--audio", help="Audio file to mux (only with --output)")
     parser.add_argument("--validate-only", action="store_true", help="Validate config and exit")
+    parser.add_argument("--dump-plan", metavar="FILE",
+                        help="Write the compiled per-frame render plan as JSON and exit")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Render frame ranges on N processes (default: 1). Output is identical.")
+    parser.add_argument("--preview", metavar="SCALE[:FPS]", type=parse_preview,
+                        help="Draft render at SCALE x the size (e.g. 0.25) and optionally FPS, "
+                             "with bilinear resampling; same timeline as the full render")
+    parser.add_argument("--no-incremental", action="store_true",
+                        help="Re-render every frame of --output-frames, ignoring the "
+                             "previous run's manifest")
+    parser.add_argument("--frame-cache-mb", type=float, default=DEFAULT_FRAME_CACHE_MB,
+                        help="Decoded source frame cache budget per render process, in MB "
+                             f"(default: {DEFAULT_FRAME_CACHE_MB})")
+    parser.add_argument("--prefetch", type=int, default=DEFAULT_PREFETCH,
+                        help="Decode source frames this many output frames ahead on a "
+                             f"background thread; 0 disables (default: {DEFAULT_PREFETCH})")
+    parser.add_argument("--profile", metavar="FILE",
+                        help="Time each pipeline stage: write a Chrome/Perfetto trace to FILE "
+                             "and print per-segment stage costs")
     args = parser.parse_args()
 
     with open(args.config) as f:
@@ -784,7 +2093,7 @@ def main():
     errors = validate_config(config)
     for e in errors:
         print(f"  Config: {e}", file=sys.stderr)
-    if any("missing" in e.lower() and "defaulting" not in e.lower() for e in errors):
+    if fatal_config_errors(errors):
         print("Fix config errors before composing.", file=sys.stderr)
         sys.exit(1)
     if args.validate_only:
@@ -794,36 +2103,32 @@ def main():
             print("Config OK")
         sys.exit(0)
 
-    comp = Compositor(config)
+    if args.preview:
+        config = preview_config(config, *args.preview)
+        print(f"Preview: {config['width']}x{config['height']} @ {config.get('fps', 30)}fps")
+
+    comp = Compositor(config, cache_mb=args.frame_cache_mb, prefetch=args.prefetch,
+                      profile=bool(args.profile))
+
+    if args.dump_plan:
+        with open(args.dump_plan, "w") as f:
+            json.dump(comp.plan, f, indent=1)
+        print(f"Render plan: {len(comp.plan)} frames → {args.dump_plan}")
+        sys.exit(0)
 
     if args.output_frames:
-        n_frames, duration = comp.compose(args.output_frames)
+        n_frames, duration = comp.compose(args.output_frames, workers=args.workers,
+                                          incremental=not args.no_incremental)
         print(f"\nTotal: {n_frames} frames, {duration:.1f}s")
     else:
-        # Compose to temp dir, then encode
-        import tempfile
-        tmpdir = tempfile.mkdtemp(prefix="s2p_frames_")
-        try:
-            n_frames, duration = comp.compose(tmpdir)
-            fps = config.get("fps", 30)
-            cmd = [
-                "ffmpeg", "-y", "-r", str(fps),
-                "-i", f"{tmpdir}/f_%04d.jpg",
-            ]
-            if args.audio:
-                cmd += ["-i", args.audio]
-            cmd += [
-                "-c:v", "libx264", "-preset", "fast", "-crf", "23",
-                "-pix_fmt", "yuv420p", "-vf", "setsar=1",
-            ]
-            if args.audio:
-                cmd += ["-c:a", "copy", "-map", "0:v", "-map", "1:a"]
-            cmd.append(args.output)
-            print(f"\nEncoding → {args.output}")
-            subprocess.run(cmd, check=True)
-            print(f"Done: {args.output}")
-        finally:
-            shutil.rmtree(tmpdir, ignore_errors=True)
+        # Stream raw frames into ffmpeg while composing
+        comp.encode(args.output, audio=args.audio, workers=args.workers)
+        print(f"Done: {args.output}")
+
+    if args.profile:
+        comp.prof.write_trace(args.profile)
+        print(f"\n{comp.prof.summary(comp.plan, comp.cfg['segments'])}")
+        print(f"Trace: {args.profile}")
 
 
 if __name__ == "__main__":
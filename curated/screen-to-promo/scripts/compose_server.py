@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Compose render server — a warm Compositor behind a local HTTP endpoint.
+
+Keeps one Compositor (fonts, decoded source frames, caption sprites) alive
+between requests and reloads the config JSON whenever it changes on disk, so
+checking frame N after an edit costs one frame render, not a cold start.
+
+Usage:
+  python3 compose_server.py --config config.json                  # http://127.0.0.1:8765
+  python3 compose_server.py --config config.json --preview 0.5    # serve half-size drafts
+
+Endpoints (frame numbers are output frames from 0, as in --dump-plan):
+  GET /                       timeline summary: size, fps, frames, segments, cache
+  GET /frame/120.jpg          one frame as JPEG (?quality=1-95, default 90)
+  GET /frame/120.png          ... or PNG
+  GET /frame.jpg?t=4.5        the frame at 4.5 s
+  GET /frames/90-150.jpg      a contact sheet of frames 90-150 (?step=N, ?cols=N,
+                              ?tile=WIDTH of each frame, default 480)
+  GET /frames/90-150.apng     the same range as an animated PNG at the output fps
+                              (?tile=WIDTH as above)
+  GET /plan/120               the render plan entry of frame 120
+  POST /reload                reload the config and drop cached source frames
+                              (use after source frames change on disk)
+"""
+
+import argparse
+import io
+import json
+import math
+import os
+import re
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+from PIL import Image
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from compose import (  # noqa: E402
+    DEFAULT_FRAME_CACHE_MB, DEFAULT_PREFETCH, Compositor, FrameCache,
+    fatal_config_errors, parse_preview, preview_config, validate_config,
+)
+
+DEFAULT_PORT = 8765
+MAX_RANGE = 300  # frames per /frames request
+DEFAULT_TILE = 480  # px wide per frame in /frames responses
+MAX_RANGE_PIXELS = 80_000_000  # all /frames tiles together (~240 MB as RGB)
+IMAGE_TYPES = {"jpg": "image/jpeg", "jpeg": "image/jpeg", "png": "image/png",
+               "apng": "image/apng"}
+
+
+class RenderService:
+    """A Compositor for one config file, rebuilt when the file changes.
+
+    Source frames are cached in a FrameCache that outlives reloads (as long
+    as the output size is unchanged), so an edit to captions or timings
+    re-renders from already decoded frames. All rendering is serialized on
+    one lock: the Compositor's buffers and held frames are single-threaded.
+    """
+
+    def __init__(self, config_path, preview=None, cache_mb=DEFAULT_FRAME_CACHE_MB,
+                 prefetch=DEFAULT_PREFETCH):
+        self.config_path = Path(config_path)
+        self.preview = preview
+        self.prefetch = prefetch
+        self.frames = FrameCache(cache_mb)
+        self.comp = None
+        self.stamp = None  # (mtime_ns, size) of the config last read, good or bad
+        self.error = None  # why it failed to load, until a good config loads
+        self.reloads = 0
+        self.lock = threading.Lock()
+
+    def current(self):
+        """The Compositor for the config as it is on disk now (call under lock)."""
+        try:
+            st = self.config_path.stat()
+            stamp = (st.st_mtime_ns, st.st_size)
+        except OSError as e:
+            stamp = None
+            if self.comp is None:
+                raise RuntimeError(f"cannot read config: {e}")
+        if stamp is not None and stamp != self.stamp:
+            self.stamp = stamp
+            self._load()
+        if self.comp is None:
+            raise RuntimeError(self.error)
+        return self.comp
+
+    def reload(self, clear=False):
+        """Rebuild from the config file now, optionally dropping cached source frames."""
+        if clear:
+            self.frames.clear()
+        self.stamp = None
+        return self.current()
+
+    def _load(self):
+        t0 = time.perf_counter()
+        try:
+            with open(self.config_path) as f:
+                config = json.load(f)
+            fatal = fatal_config_errors(validate_config(config))
+            if fatal:
+                raise ValueError("; ".join(fatal))
+            if self.preview:
+                config = preview_config(config, *self.preview)
+            old = self.comp
+            if old is not None and (config.get("width", 1920), config.get("height", 1080)) \
+                    != (old.W, old.H):
+                self.frames.clear()  # cached frames are decoded at the old size
+            comp = Compositor(config, prefetch=self.prefetch, frames=self.frames)
+        except Exception as e:  # any bad edit (e.g. a segment index out of range in the plan)
+            self.error = f"{self.config_path}: {type(e).__name__}: {e}"
+            print(f"  Reload failed, still serving the previous config: {self.error}",
+                  file=sys.stderr)
+            return
+        if self.comp is not None:
+            self.comp.close()
+        self.comp, self.error = comp, None
+        self.reloads += 1
+        print(f"  Loaded {self.config_path} ({len(comp.plan)} frames, {comp.W}x{comp.H} "
+              f"@ {comp.FPS}fps) in {(time.perf_counter() - t0) * 1000:.0f} ms")
+
+    def close(self):
+        with self.lock:
+            if self.comp is not None:
+                self.comp.close()
+
+    def summary(self):
+        comp = self.current()
+        segments = []
+        for entry in comp.plan:
+            if entry["seg"] is None:
+                continue
+            if segments and segments[-1]["index"] == entry["seg"]:
+                segments[-1]["last_frame"] = entry["fi"]
+            else:
+                segments.append({"index": entry["seg"], "type": entry["type"],
+                                 "first_frame": entry["fi"], "last_frame": entry["fi"]})
+        return {
+            "config": str(self.config_path), "width": comp.W, "height": comp.H,
+            "fps": comp.FPS, "frames": len(comp.plan),
+            "duration": round(len(comp.plan) / comp.FPS, 3), "segments": segments,
+            "cache": {"entries": len(self.frames),
+                      "mb": round(self.frames.nbytes / (1024 * 1024), 1)},
+            "reloads": self.reloads, "error": self.error,
+        }
+
+    def render(self, fi):
+        """Output frame ``fi`` as an RGB image."""
+        comp = self.current()
+        if not 0 <= fi < len(comp.plan):
+            raise IndexError(f"frame {fi} out of range 0-{len(comp.plan) - 1}")
+        return comp.render_frame(fi).copy()  # may share a cache entry or compositing buffer
+
+    def frame_at(self, t):
+        comp = self.current()
+        return min(max(0, int(t * comp.FPS)), len(comp.plan) - 1)
+
+
+def encode_image(img, fmt, quality):
+    buf = io.BytesIO()
+    if fmt == "png":
+        img.save(buf, "PNG", compress_level=1)  # local transfer: favour speed over size
+    else:
+        img.save(buf, "JPEG", quality=quality)
+    return buf.getvalue()
+
+
+def contact_sheet(frames, cols):
+    """Frames laid out left to right, top to bottom, on a grid ``cols`` wide."""
+    W, H = frames[0].size
+    rows = math.ceil(len(frames) / cols)
+    sheet = Image.new("RGB", (W * min(cols, len(frames)), H * rows), (0, 0, 0))
+    for k, img in enumerate(frames):
+        sheet.paste(img, ((k % cols) * W, (k // cols) * H))
+    return sheet
+
+
+class Handler(BaseHTTPRequestHandler):
+    service = None  # RenderService, set by main
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+        try:
+            with self.service.lock:
+                if url.path in ("", "/"):
+                    return self._json(self.service.summary())
+                m = re.fullmatch(r"/plan/(\d+)", url.path)
+                if m:
+                    comp = self.service.current()
+                    fi = int(m.group(1))
+                    if not 0 <= fi < len(comp.plan):
+                        raise IndexError(f"frame {fi} out of range 0-{len(comp.plan) - 1}")
+                    return self._json(comp.plan[fi])
+                m = re.fullmatch(r"/frame(?:/(\d+))?\.(\w+)", url.path)
+                if m:
+                    fmt = self._format(m.group(2))
+                    if m.group(1) is not None:
+                        fi = int(m.group(1))
+                    elif "t" in query:
+                        fi = self.service.frame_at(float(query["t"]))
+                    else:
+                        raise ValueError("give a frame number (/frame/N.jpg) or ?t=SECONDS")
+                    img = self.service.render(fi)
+                    return self._image(encode_image(img, fmt, int(query.get("quality", 90))), fmt)
+                m = re.fullmatch(r"/frames/(\d+)-(\d+)\.(\w+)", url.path)
+                if m:
+                    return self._range(int(m.group(1)), int(m.group(2)),
+                                       self._format(m.group(3)), query)
+            self._error(404, f"no route for {url.path}")
+        except (IndexError, ValueError) as e:
+            self._error(400, str(e))
+        except RuntimeError as e:
+            self._error(500, str(e))
+        except Exception as e:  # keep serving; report render failures to the client
+            self._error(500, f"{type(e).__name__}: {e}")
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path != "/reload":
+            return self._error(404, f"no route for {url.path}")
+        try:
+            with self.service.lock:
+                self.service.reload(clear=True)
+                self._json(self.service.summary())
+        except RuntimeError as e:
+            self._error(500, str(e))
+
+    def _range(self, first, last, fmt, query):
+        step = max(1, int(query.get("step", 1)))
+        picks = range(first, last + 1, step)
+        if not picks:
+            raise ValueError(f"empty range {first}-{last}")
+        if len(picks) > MAX_RANGE:
+            raise ValueError(f"{len(picks)} frames requested, at most {MAX_RANGE} (use ?step=N)")
+        comp = self.service.current()
+        tile = min(max(16, int(query.get("tile", DEFAULT_TILE))), comp.W)
+        tile_h = max(1, round(comp.H * tile / comp.W))
+        if len(picks) * tile * tile_h > MAX_RANGE_PIXELS:
+            raise ValueError(f"{len(picks)} frames of {tile}x{tile_h} is over "
+                             f"{MAX_RANGE_PIXELS // 1_000_000} MP (use ?step=N or a smaller ?tile=)")
+        frames = []
+        for fi in picks:
+            img = self.service.render(fi)
+            img.thumbnail((tile, tile_h))  # shrink each frame before rendering the next
+            frames.append(img)
+        if fmt == "apng":
+            buf = io.BytesIO()
+            fps = comp.FPS / step
+            frames[0].save(buf, "PNG", save_all=True, append_images=frames[1:],
+                           duration=1000 / fps, loop=0, compress_level=1)
+            return self._image(buf.getvalue(), fmt)
+        cols = max(1, int(query.get("cols", math.ceil(math.sqrt(len(frames))))))
+        sheet = contact_sheet(frames, cols)
+        return self._image(encode_image(sheet, fmt, int(query.get("quality", 90))), fmt)
+
+    def _format(self, ext):
+        ext = ext.lower()
+        if ext not in IMAGE_TYPES:
+            raise ValueError(f"unknown image type .{ext} (jpg, png, apng)")
+        return "jpg" if ext == "jpeg" else ext
+
+    def _image(self, data, fmt):
+        self._send(200, IMAGE_TYPES[fmt], data)
+
+    def _json(self, obj, code=200):
+        self._send(code, "application/json", json.dumps(obj, indent=1).encode())
+
+    def _error(self, code, message):
+        self._json({"error": message}, code)
+
+    def _send(self, code, ctype, data):
+        self.send_response(code)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("Cache-Control", "no-store")
+        if self.service.error:
+            # Still serving the previous config: say so on every response
+            error = self.service.error.encode("ascii", "replace").decode()
+            self.send_header("X-Config-Error", error)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, fmt, *args):
+        print(f"  {fmt % args}", file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve rendered frames from a warm Compositor")
+    parser.add_argument("--config", required=True, help="Config JSON file (reloaded on change)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--preview", metavar="SCALE[:FPS]", type=parse_preview,
+                        help="Serve draft frames at SCALE x the size (see compose.py --preview)")
+    parser.add_argument("--frame-cache-mb", type=float, default=DEFAULT_FRAME_CACHE_MB,
+                        help=f"Decoded source frame cache budget, in MB "
+                             f"(default: {DEFAULT_FRAME_CACHE_MB})")
+    parser.add_argument("--prefetch", type=int, default=DEFAULT_PREFETCH,
+                        help="Decode source frames this many output frames past each "
+                             f"request; 0 disables (default: {DEFAULT_PREFETCH})")
+    args = parser.parse_args()
+
+    service = RenderService(args.config, preview=args.preview, cache_mb=args.frame_cache_mb,
+                            prefetch=args.prefetch)
+    try:
+        with service.lock:
+            service.current()
+    except RuntimeError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+
+    Handler.service = service
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    print(f"Serving {args.config} on http://{args.host}:{server.server_port}/ (pid {os.getpid()})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    main()